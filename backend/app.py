@@ -1,12 +1,17 @@
+import os
+import json
 from flask import Flask, render_template, request
 from flask_cors import CORS
-import time
-from sqlalchemy.exc import OperationalError
 
 
 from db import mysql_engine, MYSQL_DATABASE
+from helpers.database.SchemaMigrator import SchemaMigrator
 from helpers.search.SimilarWines import SimilarWines
+from helpers.search.WineMetadataStore import WineMetadataStore
+from helpers.misc.MemoryUsage import print_memory_usage
 from routes import (
+    result_cache,
+    seed_request_counts,
     wine_reviews_search,
     suggest_wines,
     suggest_varietals,
@@ -15,6 +20,7 @@ from routes import (
 
 # Path to init.sql file. This file can be replaced with your own file for testing on localhost, but do NOT move the init.sql file
 mysql_engine.load_file_into_db()
+SchemaMigrator(mysql_engine, MYSQL_DATABASE).migrate()
 
 app = Flask(__name__)
 CORS(app)
@@ -39,21 +45,34 @@ def suggest_varietal():
 def suggest_region():
     return suggest_regions(request)
 
-def create_wine_index():
-    start_time = time.time()
+@app.route('/pool_stats')
+def pool_stats():
+    return json.dumps(mysql_engine.pool_stats())
 
-    try:
-        query_sql = f"""DROP INDEX wine_index ON {MYSQL_DATABASE}.wine_data;"""
-        mysql_engine.query_executor(query_sql)
-    except OperationalError as e:
-        print(f"Error occurred while dropping the index: {e}")
+@app.route('/cache_stats')
+def cache_stats():
+    return json.dumps(result_cache.stats())
 
-    query_sql = f"""CREATE INDEX wine_index ON {MYSQL_DATABASE}.wine_data(wine);"""
-    mysql_engine.query_executor(query_sql)
-    end_time = time.time()
-    print("Time taken for creating index: {:.4f} seconds".format(end_time - start_time))
+@app.route('/seed_stats')
+def seed_stats():
+    k = request.args.get("k", default=1000, type=int)
+    return json.dumps({
+        "cache": SimilarWines.seed_cache_stats(),
+        "most_requested": seed_request_counts.most_common(k),
+    })
 
-SimilarWines.initialize_cache()
-# create_wine_index()
+corpus_model = SimilarWines.initialize_corpus_model()
+print_memory_usage("after building CorpusModel", corpus_model.memory_usage())
+SimilarWines.release_build_caches()
+SimilarWines.initialize_neighbor_table()
+store = WineMetadataStore.initialize(corpus_model.wine_table)
+print_memory_usage("after loading WineMetadataStore", store.flavors.memory_usage(store.text["review"]))
+
+# Pre-score the most requested seed wines, as saved from /seed_stats
+seed_cache_warm_file = os.environ.get("SEED_CACHE_WARM_FILE")
+if seed_cache_warm_file and os.path.exists(seed_cache_warm_file):
+    with open(seed_cache_warm_file) as f:
+        most_requested = json.load(f)["most_requested"]
+    SimilarWines.warm_seed_cache([wine_name for wine_name, _ in most_requested[:int(os.environ.get("SEED_CACHE_WARM_COUNT", 1000))]])
 
 # app.run(debug=True)
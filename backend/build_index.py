@@ -0,0 +1,50 @@
+"""Builds the on-disk search index that the app memory-maps at startup.
+
+Run from the backend folder whenever the wine_data table changes:
+
+    python build_index.py [output_path] [--workers N] [--benchmark] [--if-stale]
+
+output_path defaults to $WINE_INDEX_PATH, or backend/wine_index.bin. The
+reviews are tokenized on --workers processes (default: $WINE_INDEX_WORKERS,
+or one per CPU). --benchmark first builds the inverted index with 1, 2, 4 and
+8 workers and prints how the build time scales. --if-stale skips the build
+if the existing index was built from the current contents of wine_data (same
+CHECKSUM TABLE), which the Docker setup uses to only rebuild after the data
+changed. The schema migration the app runs at startup is applied first, so
+the checksum is that of the table the app runs with.
+"""
+import sys
+import time
+import argparse
+
+from db import mysql_engine, MYSQL_DATABASE
+from helpers.database.SchemaMigrator import SchemaMigrator
+from helpers.search.SimilarWines import SimilarWines
+from helpers.search.IndexStore import IndexStore, DEFAULT_INDEX_PATH
+from helpers.search.ParallelIndexBuilder import ParallelIndexBuilder
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_path", nargs="?", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--if-stale", action="store_true")
+    args = parser.parse_args()
+
+    # The app migrates wine_data at startup, and the generated columns change
+    # its checksum: migrating first keeps the checksum the app's table has
+    SchemaMigrator(mysql_engine, MYSQL_DATABASE).migrate()
+
+    # Taken before reading the reviews, so changes made during the build trigger the next one
+    checksum = SimilarWines.corpus_checksum()
+    if args.if_stale and checksum is not None and IndexStore.source_checksum(args.output_path) == checksum:
+        print("Skipping build of {}: up to date with wine_data (checksum {})".format(args.output_path, checksum))
+        sys.exit(0)
+
+    if args.benchmark:
+        ParallelIndexBuilder.benchmark(SimilarWines.review_batches)
+
+    start_time = time.time()
+    IndexStore.save(SimilarWines.build_corpus_model(args.workers), args.output_path, source_checksum=checksum)
+    end_time = time.time()
+    print("Time taken for building search index: {:.4f} seconds".format(end_time - start_time))
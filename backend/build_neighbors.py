@@ -0,0 +1,41 @@
+"""Builds the nearest-neighbor table of the search index.
+
+Run from the backend folder after build_index.py:
+
+    python build_neighbors.py [output_path] [--index PATH] [--neighbors N] [--workers N] [--block-size B]
+
+For every wine, the table holds the top --neighbors (default: 1000, or
+$SEED_CACHE_TOP_N) wines a search seeded by that wine alone returns. The app
+loads it at startup if it matches the index, and answers such searches with a
+table lookup. output_path defaults to $WINE_NEIGHBORS_PATH, or
+backend/wine_neighbors.bin; --index to the app's index. The seeds are ranked
+in blocks on --workers processes (default: $WINE_INDEX_WORKERS, or one per CPU).
+"""
+import os
+import time
+import argparse
+
+from helpers.search.SimilarWines import SEED_RANKING_SIZE
+from helpers.search.IndexStore import IndexStore, DEFAULT_INDEX_PATH
+from helpers.search.WineMetadataStore import WineMetadataStore
+from helpers.search.NeighborTable import DEFAULT_NEIGHBORS_PATH
+from helpers.search.NeighborTableBuilder import NeighborTableBuilder
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_path", nargs="?", default=DEFAULT_NEIGHBORS_PATH)
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--neighbors", type=int, default=SEED_RANKING_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--block-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.index):
+        parser.error("no search index at {}: run build_index.py first".format(args.index))
+
+    start_time = time.time()
+    store = WineMetadataStore.initialize(IndexStore.load(args.index).wine_table)
+    table = NeighborTableBuilder(args.workers, args.block_size).build(args.index, store, args.neighbors)
+    table.save(args.output_path)
+    end_time = time.time()
+    print("Time taken for building neighbor table: {:.4f} seconds".format(end_time - start_time))
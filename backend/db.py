@@ -13,4 +13,14 @@ MYSQL_USER_PASSWORD = "admin"
 MYSQL_PORT = 3306
 MYSQL_DATABASE = "wine_dataset"
 
-mysql_engine = MySQLDatabaseHandler(MYSQL_USER,MYSQL_USER_PASSWORD,MYSQL_PORT,MYSQL_DATABASE)
\ No newline at end of file
+# Connection pool settings (per process), see MySQLDatabaseHandler
+MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", 5))
+MYSQL_MAX_OVERFLOW = int(os.environ.get("MYSQL_MAX_OVERFLOW", 10))
+MYSQL_POOL_TIMEOUT = int(os.environ.get("MYSQL_POOL_TIMEOUT", 30))
+MYSQL_POOL_RECYCLE = int(os.environ.get("MYSQL_POOL_RECYCLE", 3600))
+
+mysql_engine = MySQLDatabaseHandler(MYSQL_USER,MYSQL_USER_PASSWORD,MYSQL_PORT,MYSQL_DATABASE,
+                                    pool_size=MYSQL_POOL_SIZE,
+                                    max_overflow=MYSQL_MAX_OVERFLOW,
+                                    pool_timeout=MYSQL_POOL_TIMEOUT,
+                                    pool_recycle=MYSQL_POOL_RECYCLE)
\ No newline at end of file
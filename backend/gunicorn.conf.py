@@ -0,0 +1,31 @@
+# Gunicorn settings, picked up with --config gunicorn.conf.py
+import gc
+import os
+
+from helpers.misc.MemoryUsage import print_process_memory_usage
+
+# Load app.py (and with it the search index and corpus model) once in the
+# master before forking, so all workers share those pages copy-on-write
+# instead of each building its own copy. Set GUNICORN_PRELOAD=0 to disable.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+def when_ready(server):
+    if preload_app:
+        # Move everything built so far out of the garbage collector's reach:
+        # collections would otherwise write to (and unshare) every object's page
+        gc.collect()
+        gc.freeze()
+    print_process_memory_usage("in gunicorn master")
+
+def post_fork(server, worker):
+    if preload_app:
+        # Pooled connections opened by the master while loading the app must
+        # not be shared between processes; each worker opens its own
+        from db import mysql_engine
+        mysql_engine.dispose_after_fork()
+
+def post_worker_init(worker):
+    print_process_memory_usage("in gunicorn worker after init")
+
+def worker_exit(server, worker):
+    print_process_memory_usage("in gunicorn worker at exit")
@@ -1,49 +1,170 @@
 import os
+import time
+import threading
+from contextlib import contextmanager
 import sqlalchemy as db
 
+from helpers.database.SqlFileLoader import SqlFileLoader
+
 class MySQLDatabaseHandler(object):
-    
-    def __init__(self,MYSQL_USER,MYSQL_USER_PASSWORD,MYSQL_PORT,MYSQL_DATABASE,MYSQL_HOST = "localhost"):
+    """Pooled access to the MySQL database.
+
+    Connections come from a QueuePool of pool_size connections, plus up to
+    max_overflow extra ones under load. A lease waits at most pool_timeout
+    seconds for a free connection. Connections are checked with a ping when
+    leased (pool_pre_ping) and replaced after pool_recycle seconds, so the
+    ones the server has closed are never handed out. Every lease is returned
+    to the pool as soon as the query is done (see connection()).
+
+    Queries are strings with :name placeholders for bound parameters.
+    """
+    # Rows per fetchmany call when streaming
+    DEFAULT_BATCH_SIZE = 2000
+
+    def __init__(self,MYSQL_USER,MYSQL_USER_PASSWORD,MYSQL_PORT,MYSQL_DATABASE,MYSQL_HOST = "localhost",
+                 pool_size = 5, max_overflow = 10, pool_timeout = 30, pool_recycle = 3600, pool_pre_ping = True):
         self.IS_DOCKER = True if 'DB_NAME' in os.environ else False
         self.MYSQL_HOST = os.environ['DB_NAME'] if self.IS_DOCKER else MYSQL_HOST
         self.MYSQL_USER = "admin" if self.IS_DOCKER else MYSQL_USER
         self.MYSQL_USER_PASSWORD = "admin" if self.IS_DOCKER else MYSQL_USER_PASSWORD
         self.MYSQL_PORT = 3306 if self.IS_DOCKER else MYSQL_PORT
         self.MYSQL_DATABASE = MYSQL_DATABASE
+
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pool_pre_ping = pool_pre_ping
+
+        self._stats_lock = threading.Lock()
+        self._leases = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
         self.engine = self.validate_connection()
 
     def validate_connection(self):
+        url = f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_USER_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}"
+
+        # The database may not exist yet, so create it over a one-off connection
+        # before pointing the pooled engine at it
+        bootstrap_engine = db.create_engine(url, poolclass=db.pool.NullPool)
+        with bootstrap_engine.connect() as conn:
+            conn.execute(db.text(f"CREATE DATABASE IF NOT EXISTS {self.MYSQL_DATABASE}"))
+        bootstrap_engine.dispose()
+
+        return db.create_engine(
+            f"{url}/{self.MYSQL_DATABASE}",
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+            pool_pre_ping=self.pool_pre_ping,
+        )
+
+    def dispose_after_fork(self):
+        """Drops the pooled connections inherited from a parent process
+        without closing them, so the parent can keep using them."""
+        self.engine.dispose(close=False)
+
+    @contextmanager
+    def connection(self):
+        """Leases a pooled connection for the duration of the with block."""
+        pool = self.engine.pool
+        # Every connection (pooled and overflow) is in use, so this lease has to wait
+        exhausted = pool.checkedout() >= self.pool_size + self.max_overflow
+        start_time = time.perf_counter()
+        conn = self.engine.connect()
+        wait_time = time.perf_counter() - start_time
 
-        engine = db.create_engine(f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_USER_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}")
-        conn = engine.connect()
-        conn.execute(f"CREATE DATABASE IF NOT EXISTS {self.MYSQL_DATABASE}")
-        conn.execute(f"USE {self.MYSQL_DATABASE}")
-        return engine
+        with self._stats_lock:
+            self._leases += 1
+            if exhausted:
+                self._waits += 1
+                self._wait_time += wait_time
+                self._max_wait_time = max(self._max_wait_time, wait_time)
+
+        try:
+            yield conn
+        finally:
+            conn.close()
 
     def lease_connection(self):
+        """Returns a pooled Connection; the caller must close() it to return it
+        to the pool. Prefer the connection() context manager."""
         return self.engine.connect()
-    
-    def query_executor(self,query):
-        conn = self.lease_connection()
-        if type(query) == list:
-            for i in query:
-                conn.execute(i)
-        else:
-            conn.execute(query)
-        
-
-    def query_selector(self,query):
-        conn = self.lease_connection()
-        data = conn.execute(query)
-        return data
-
-    def load_file_into_db(self,file_path  = None):
+
+    def query_executor(self,query,params = None):
+        """Executes query (or a list of queries) in one transaction."""
+        with self.connection() as conn:
+            with conn.begin():
+                if type(query) == list:
+                    for i in query:
+                        conn.execute(db.text(i), params or {})
+                else:
+                    conn.execute(db.text(query), params or {})
+
+    def query_selector(self,query,params = None):
+        """Returns the full result of query, buffered client-side.
+
+        The connection is back in the pool before this returns; the result
+        supports iteration, fetchone(), fetchall() and keys().
+        """
+        with self.connection() as conn:
+            return conn.execute(db.text(query), params or {}).freeze()()
+
+    def query_batches(self,query,params = None,batch_size = None):
+        """Yields the rows of query in lists of up to batch_size rows.
+
+        Rows come from an unbuffered server-side cursor with fetchmany, so only
+        one batch is held in memory at a time, and the caller can process a
+        batch while the server sends the next one. The connection stays leased
+        until the generator is exhausted or closed, and cannot be used for
+        other queries meanwhile.
+        """
+        if batch_size is None:
+            batch_size = self.DEFAULT_BATCH_SIZE
+        with self.connection() as conn:
+            result = conn.execution_options(stream_results=True).execute(db.text(query), params or {})
+            try:
+                while True:
+                    batch = result.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield batch
+            finally:
+                result.close()
+
+    def query_stream(self,query,params = None,batch_size = None):
+        """Yields the rows of query one by one (see query_batches)."""
+        for batch in self.query_batches(query, params, batch_size):
+            yield from batch
+
+    def pool_stats(self):
+        """Returns pool usage counters, for monitoring."""
+        pool = self.engine.pool
+        with self._stats_lock:
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": self.max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "leases": self._leases,
+                "waits": self._waits,
+                "wait_time_total": self._wait_time,
+                "wait_time_max": self._max_wait_time,
+            }
+
+    def load_file_into_db(self,file_path  = None,csv_path = None):
+        """Loads init.sql (see SqlFileLoader), skipping it if it did not change
+        since the last load. With csv_path (default: $WINE_DATA_CSV), the
+        wine_data rows are bulk loaded from that CSV export instead."""
         if self.IS_DOCKER:
             return
         if file_path is None:
             file_path = os.path.join(os.environ['ROOT_PATH'],'init.sql')
-        sql_file = open(file_path,"r")
-        sql_file_data = list(filter(lambda x:x != '',sql_file.read().split(";\n")))
-        self.query_executor(sql_file_data)
-        sql_file.close()
-
+        if csv_path is None:
+            csv_path = os.environ.get('WINE_DATA_CSV')
+        SqlFileLoader(self).load(file_path, csv_path)
@@ -0,0 +1,112 @@
+import time
+from sqlalchemy.exc import OperationalError
+
+class SchemaMigrator:
+    """Brings the wine_data table up to the schema SimilarWines'
+    SEED_REVIEW_QUERY expects, the one query that still filters wine_data
+    (filters, facets and autocomplete are answered in memory).
+
+    Adds wine_lower, the lowercase wine name generated (and stored) by MySQL
+    so it stays in sync with any insert, with a B-tree index. It drops the
+    lookup columns and indexes of earlier versions of this migration, which
+    nothing queries anymore. Every step checks information_schema first, so
+    migrate() is idempotent and also repairs a table that was recreated from
+    init.sql.
+    """
+    TABLE = "wine_data"
+
+    # (column, generating expression). LEFT() keeps the values within the
+    # VARCHAR length without truncation warnings, which strict mode would reject.
+    LOOKUP_COLUMNS = [
+        ("wine_lower", "LEFT(LOWER(wine), 255)"),
+    ]
+
+    # (index name, column)
+    INDEXES = [(f"idx_{column}", column) for column, _ in LOOKUP_COLUMNS]
+
+    # Indexes and columns replaced by this migration, or added by earlier versions of it
+    OBSOLETE_INDEXES = ["wine_index", "idx_country_lower", "idx_varietal_lower", "idx_category_lower", "idx_appellation_prefix_lower", "idx_price_numeric"]
+    OBSOLETE_COLUMNS = ["country_lower", "varietal_lower", "category_lower", "appellation_prefix_lower"]
+
+    # MySQL errors of a statement that another process already applied:
+    # duplicate column (1060), duplicate key name (1061), index or column already dropped (1091)
+    ALREADY_APPLIED_ERRORS = {1060, 1061, 1091}
+
+    def __init__(self, mysql_engine, database):
+        self.mysql_engine = mysql_engine
+        self.database = database
+
+    def existing_columns(self):
+        query_sql = """SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                       WHERE TABLE_SCHEMA = :database AND TABLE_NAME = :table"""
+        return set(row[0] for row in self.mysql_engine.query_selector(query_sql, {"database": self.database, "table": self.TABLE}))
+
+    def existing_indexes(self):
+        query_sql = """SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+                       WHERE TABLE_SCHEMA = :database AND TABLE_NAME = :table"""
+        return set(row[0] for row in self.mysql_engine.query_selector(query_sql, {"database": self.database, "table": self.TABLE}))
+
+    def pending_statements(self):
+        """Returns the DDL statements still needed to reach the target schema."""
+        columns = self.existing_columns()
+        indexes = self.existing_indexes()
+        table = f"{self.database}.{self.TABLE}"
+
+        statements = []
+        for index in self.OBSOLETE_INDEXES:
+            if index in indexes:
+                statements.append(f"DROP INDEX {index} ON {table}")
+        for column in self.OBSOLETE_COLUMNS:
+            if column in columns:
+                statements.append(f"ALTER TABLE {table} DROP COLUMN {column}")
+        for column, expression in self.LOOKUP_COLUMNS:
+            if column not in columns:
+                statements.append(f"ALTER TABLE {table} ADD COLUMN {column} VARCHAR(255) GENERATED ALWAYS AS ({expression}) STORED")
+        for index, column in self.INDEXES:
+            if index not in indexes:
+                statements.append(f"CREATE INDEX {index} ON {table}({column})")
+        return statements
+
+    def migrate(self):
+        start_time = time.time()
+
+        statements = self.pending_statements()
+        for statement in statements:
+            print(f"Migrating: {statement}")
+            try:
+                self.mysql_engine.query_executor(statement)
+            except OperationalError as e:
+                # Another process applied the same statement concurrently. Any
+                # other failure leaves the queries without their columns, so it
+                # must stop the startup
+                if e.orig is None or not e.orig.args or e.orig.args[0] not in self.ALREADY_APPLIED_ERRORS:
+                    raise
+                print(f"Already migrated: {e}")
+
+        end_time = time.time()
+        print("Time taken for migrating {} ({} statements): {:.4f} seconds".format(self.TABLE, len(statements), end_time - start_time))
+
+    def explain(self, query_sql, params=None):
+        """Returns the EXPLAIN rows of query_sql as dicts."""
+        result = self.mysql_engine.query_selector(f"EXPLAIN {query_sql}", params)
+        keys = list(result.keys())
+        return [dict(zip(keys, row)) for row in result]
+
+    def check_index_usage(self, checks):
+        """Runs EXPLAIN on every (name, (query, params), index) in checks.
+
+        index is the index the query's WHERE clause must be able to use (it
+        has to appear in possible_keys; whether the planner picks it depends
+        on the data), or None for queries that are known to scan. Prints the
+        plans and returns the names of the queries that regressed.
+        """
+        regressions = []
+        for name, (query_sql, params), index in checks:
+            plan = self.explain(query_sql, params)[0]
+            possible_keys = (plan.get("possible_keys") or "").split(",")
+            ok = index is None or index in possible_keys
+            print("{:<28} type={:<6} key={:<28} rows={:<8} {}".format(
+                name, str(plan.get("type")), str(plan.get("key")), str(plan.get("rows")), "ok" if ok else f"REGRESSION: {index} not usable"))
+            if not ok:
+                regressions.append(name)
+        return regressions
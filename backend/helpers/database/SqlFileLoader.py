@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import hashlib
+import sqlalchemy as db
+
+class SqlFileLoader:
+    """Loads a SQL script such as init.sql into MySQL.
+
+    - The script is read line by line and split into statements by a small
+      lexer that knows about quotes, escapes and comments. The whole file is
+      never held in memory.
+    - Consecutive INSERTs into the same table (and columns) are merged into
+      multi-row INSERTs of up to batch_bytes. Each one runs in its own
+      transaction.
+    - The rows of one table can come from a CSV export (see export_csv)
+      instead. They are then bulk loaded with LOAD DATA LOCAL INFILE, and the
+      script's INSERTs into that table are skipped.
+    - The checksum of the loaded files is recorded in the data_loads table.
+      A load is skipped when nothing changed since the last one.
+    """
+    CHECKSUM_TABLE = "data_loads"
+    DEFAULT_BATCH_BYTES = 4 * 1024 * 1024
+
+    NORMAL_TOKEN = re.compile(r"""[;'"`#]|--(?=\s|$)|/\*""")
+    INSERT_PREFIX = re.compile(r"\s*INSERT\s+INTO\s+(.+?)\s+VALUES?\b\s*", re.IGNORECASE | re.DOTALL)
+
+    def __init__(self, mysql_engine, batch_bytes=DEFAULT_BATCH_BYTES):
+        self.mysql_engine = mysql_engine
+        self.batch_bytes = batch_bytes
+
+    @classmethod
+    def iter_statements(cls, lines):
+        """Yields the statements of a SQL script given as an iterable of lines.
+
+        Line comments are dropped; block comments are kept, since MySQL
+        executes the /*!...*/ ones that dumps contain.
+        """
+        statement = []
+        quote = None
+        escaped = False
+        in_block_comment = False
+
+        for line in lines:
+            pos = 0
+            while pos < len(line):
+                if in_block_comment:
+                    end = line.find("*/", pos)
+                    if end < 0:
+                        statement.append(line[pos:])
+                        break
+                    statement.append(line[pos:end + 2])
+                    pos = end + 2
+                    in_block_comment = False
+                elif quote is not None:
+                    # Inside a string: skip to its closing quote, past backslash escapes.
+                    # A doubled quote ('') closes and reopens it, which splits the same.
+                    start = pos
+                    if escaped:
+                        pos += 1
+                        escaped = False
+                    while pos < len(line) and line[pos] != quote:
+                        if line[pos] == "\\":
+                            if pos + 1 == len(line):
+                                escaped = True
+                            pos += 1
+                        pos += 1
+                    if pos < len(line):
+                        pos += 1
+                        quote = None
+                    statement.append(line[start:pos])
+                else:
+                    match = cls.NORMAL_TOKEN.search(line, pos)
+                    if match is None:
+                        statement.append(line[pos:])
+                        break
+                    statement.append(line[pos:match.start()])
+                    token = match.group()
+                    pos = match.end()
+                    if token == ";":
+                        text = "".join(statement).strip()
+                        if text:
+                            yield text
+                        statement = []
+                    elif token in ("#", "--"):
+                        statement.append("\n")
+                        break
+                    elif token == "/*":
+                        statement.append(token)
+                        in_block_comment = True
+                    else:
+                        statement.append(token)
+                        quote = token
+
+        text = "".join(statement).strip()
+        if text:
+            yield text
+
+    @classmethod
+    def split_insert(cls, statement):
+        """Returns (prefix up to VALUES, values list) of a plain INSERT, else None."""
+        match = cls.INSERT_PREFIX.match(statement)
+        if match is None or not statement.endswith(")"):
+            return None
+        return "INSERT INTO {} VALUES ".format(match.group(1)), statement[match.end():]
+
+    @staticmethod
+    def insert_table(prefix):
+        """Unqualified, unquoted table name of an INSERT prefix."""
+        return prefix.split()[2].split("(")[0].split(".")[-1].strip("`")
+
+    @staticmethod
+    def file_checksum(*paths):
+        digest = hashlib.sha1()
+        for path in paths:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def is_current(self, source, checksum, table):
+        """True if source was last loaded with this checksum and table still exists."""
+        self.mysql_engine.query_executor(f"""CREATE TABLE IF NOT EXISTS {self.CHECKSUM_TABLE} (
+            source VARCHAR(255) PRIMARY KEY,
+            checksum CHAR(40) NOT NULL,
+            row_count BIGINT NOT NULL,
+            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+        loaded = self.mysql_engine.query_selector(
+            f"SELECT checksum FROM {self.CHECKSUM_TABLE} WHERE source = :source", {"source": source}).fetchone()
+        tables = self.mysql_engine.query_selector(
+            "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table", {"table": table}).fetchone()
+        return loaded is not None and loaded[0] == checksum and tables[0] > 0
+
+    def record_load(self, source, checksum, row_count):
+        self.mysql_engine.query_executor(
+            f"REPLACE INTO {self.CHECKSUM_TABLE} (source, checksum, row_count) VALUES (:source, :checksum, :row_count)",
+            {"source": source, "checksum": checksum, "row_count": row_count})
+
+    def load(self, sql_path, csv_path=None, csv_table="wine_data"):
+        """Runs the script at sql_path, unless it (and csv_path) did not change
+        since the last load. With csv_path, the rows of csv_table are bulk
+        loaded from that CSV export instead of the script's INSERTs.
+
+        Returns the number of rows inserted (0 if skipped).
+        """
+        paths = [sql_path] if csv_path is None else [sql_path, csv_path]
+        source = os.path.basename(sql_path)
+        checksum = self.file_checksum(*paths)
+        if self.is_current(source, checksum, csv_table):
+            print("Skipping load of {}: unchanged since the last load".format(" + ".join(paths)))
+            return 0
+
+        start_time = time.time()
+        row_count = 0
+        with self.mysql_engine.connection() as conn:
+            with open(sql_path, "r", encoding="utf-8") as sql_file:
+                for statement in self.iter_batches(self.iter_statements(sql_file), skip_inserts_into=csv_table if csv_path else None):
+                    with conn.begin():
+                        # Raw SQL: no parameter substitution, so '%' and ':' in the data are left alone
+                        result = conn.exec_driver_sql(statement, execution_options={"no_parameters": True})
+                    if statement[:6].upper() == "INSERT":
+                        row_count += max(result.rowcount, 0)
+
+        if csv_path is not None:
+            row_count += self.load_csv(csv_path, csv_table)
+
+        self.record_load(source, checksum, row_count)
+        end_time = time.time()
+        elapsed = end_time - start_time
+        print("Time taken for loading {} rows from {}: {:.4f} seconds ({:.0f} rows/sec)".format(
+            row_count, " + ".join(paths), elapsed, row_count / elapsed if elapsed > 0 else 0))
+        return row_count
+
+    def iter_batches(self, statements, skip_inserts_into=None):
+        """Merges consecutive INSERTs with the same prefix into multi-row INSERTs."""
+        prefix = None
+        values = []
+        size = 0
+        for statement in statements:
+            insert = self.split_insert(statement)
+            if insert is not None and skip_inserts_into is not None and self.insert_table(insert[0]) == skip_inserts_into:
+                continue
+            if prefix is not None and (insert is None or insert[0] != prefix or size + len(insert[1]) > self.batch_bytes):
+                yield prefix + ",".join(values)
+                prefix, values, size = None, [], 0
+            if insert is None:
+                yield statement
+                continue
+            prefix = insert[0]
+            values.append(insert[1])
+            size += len(insert[1]) + 1
+        if prefix is not None:
+            yield prefix + ",".join(values)
+
+    def load_csv(self, csv_path, table):
+        """Bulk loads a CSV written by export_csv into table. Returns the row count.
+
+        The server must allow local_infile.
+        """
+        start_time = time.time()
+        with open(csv_path, "r", encoding="utf-8") as csv_file:
+            columns = csv_file.readline().rstrip("\n")
+        path_literal = os.path.abspath(csv_path).replace("\\", "\\\\").replace("'", "\\'")
+        query_sql = f"""LOAD DATA LOCAL INFILE '{path_literal}' INTO TABLE {table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            IGNORE 1 LINES ({columns})"""
+
+        # LOCAL INFILE has to be enabled on the client connection, which the pool's connections are not
+        engine = db.create_engine(self.mysql_engine.engine.url, connect_args={"local_infile": True}, poolclass=db.pool.NullPool)
+        with engine.connect() as conn:
+            with conn.begin():
+                row_count = conn.exec_driver_sql(query_sql, execution_options={"no_parameters": True}).rowcount
+        engine.dispose()
+
+        end_time = time.time()
+        print("Time taken for LOAD DATA of {} rows into {}: {:.4f} seconds".format(row_count, table, end_time - start_time))
+        return row_count
+
+    @staticmethod
+    def csv_field(value):
+        if value is None:
+            return "\\N"
+        if isinstance(value, (int, float)):
+            return repr(value)
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r").replace("\0", "\\0")
+        return '"' + text + '"'
+
+    def export_csv(self, table, csv_path):
+        """Writes the stored (non-generated) columns of table to csv_path in the
+        format load_csv reads, with the column names on the first line."""
+        start_time = time.time()
+        columns = [row[0] for row in self.mysql_engine.query_selector(
+            """SELECT COLUMN_NAME FROM information_schema.COLUMNS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND EXTRA NOT LIKE '%GENERATED%'
+               ORDER BY ORDINAL_POSITION""", {"table": table})]
+
+        row_count = 0
+        with open(csv_path, "w", encoding="utf-8", newline="") as csv_file:
+            csv_file.write(",".join(columns) + "\n")
+            for batch in self.mysql_engine.query_batches(f"SELECT {', '.join(columns)} FROM {table}"):
+                csv_file.writelines(",".join(self.csv_field(value) for value in row) + "\n" for row in batch)
+                row_count += len(batch)
+
+        end_time = time.time()
+        print("Time taken for exporting {} rows of {} to {}: {:.4f} seconds".format(row_count, table, csv_path, end_time - start_time))
+        return row_count
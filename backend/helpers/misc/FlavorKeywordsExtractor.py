@@ -1,4 +1,3 @@
-import re
 import logging
 import sys
 import os
@@ -10,34 +9,30 @@ from nltk.corpus import stopwords
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from db import mysql_engine, MYSQL_DATABASE
+from helpers.search.Tokenizer import tokenize
 
 class FlavorKeywords:
     def __init__(self):
         self.reviews = self.get_all_reviews()
         self.word_counts = self.get_word_counts_sorted()
         self.flavor_words = self.get_flavor_words()
-        mysql_engine.load_file_into_db("../init.sql")
 
     @staticmethod
     def tokenize(text):
         """Returns a list of words that make up the text.
         
-        Note: for simplicity, lowercase everything.
-        Requirement: Use Regex to satisfy this function
+        Note: for simplicity, lowercase everything. Uses the shared Tokenizer,
+        so the terms match the search index.
         
         Params: {text: String}
         Returns: List
         """
-        text = text.lower()
-        result = re.findall(r'\b[^\W\d]+\b', text)
-        
-        return result
+        return tokenize(text)
 
     def get_all_reviews(self):
         query_sql = f"""SELECT review FROM {MYSQL_DATABASE}.wine_data"""
-        data = mysql_engine.query_selector(query_sql)
-        reviews = [d[0] for d in data]
-        tokenized_reviews = [self.tokenize(review) for review in reviews]
+        # Streamed, so only one batch of raw reviews is in memory at a time
+        tokenized_reviews = [self.tokenize(review) for review, in mysql_engine.query_stream(query_sql)]
         return tokenized_reviews
     
     def get_word_counts_sorted(self):
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 # From A4
 ADJACENT_CHARACTERS = [
     ("a", "q"),
@@ -347,52 +349,99 @@ FLAVOR_KEYWORDS = [
 ]
 
 
-class FlavorTypoCorrector:
-    def __init__(self, threshold): 
-        self.threshold = threshold
+# Substitution cost of two characters typed with neighboring keys; any other substitution costs 2
+ADJACENT_COSTS = {pair: 1.5 for pair in ADJACENT_CHARACTERS}
+
+
+def weighted_edit_distance(word1, word2, cutoff=float("inf")):
+    """Minimum edit distance from word1 to word2, where insertions and
+    deletions cost 1 and substitutions 1.5 (neighboring keys) or 2.
+
+    The DP keeps one row at a time. The length difference and every row's
+    minimum are lower bounds of the distance, so this returns inf as soon as
+    one of them exceeds cutoff.
+    """
+    # Every character of the length difference needs an insertion or a deletion
+    if abs(len(word1) - len(word2)) > cutoff:
+        return float("inf")
+    previous = list(range(len(word2) + 1))
+    for i, char1 in enumerate(word1, 1):
+        current = [i]
+        for j, char2 in enumerate(word2, 1):
+            if char1 == char2:
+                substitution = previous[j - 1]
+            else:
+                substitution = previous[j - 1] + ADJACENT_COSTS.get((char1, char2), 2)
+            current.append(min(previous[j] + 1, current[j - 1] + 1, substitution))
+        if min(current) > cutoff:
+            return float("inf")
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """Burkhard-Keller tree over words, for finding the words close to a query.
 
-    def __get_substitution_cost(self, word1, word2, i, j):
-        if word1[i - 1] == word2[j - 1]:
-            return 0
-        elif (word1[i - 1], word2[j - 1]) in ADJACENT_CHARACTERS:
-            return 1.5
-        else:
-            return 2
+    weighted_edit_distance is a metric (the adjacency table is symmetric and
+    no substitution costs more than a deletion plus an insertion), so a
+    subtree whose edge distance k differs from the query's distance d to its
+    parent by radius or more cannot hold a word closer than radius.
+    """
 
-    def __get_minimum_edit_distance_matrix(self, word1, word2):
-        matrix = {(0, 0): 0}
-        for i in range(1, len(word1) + 1):
-            matrix[i, 0] = matrix[i - 1, 0] + 1
-        for i in range(1, len(word2) + 1):
-            matrix[0, i] = matrix[0, i - 1] + 1
-        for i in range(1, len(word1) + 1):
-            for j in range(1, len(word2) + 1):
-                matrix[i, j] = min(
-                    matrix[i - 1, j] + 1,
-                    matrix[i, j - 1] + 1,
-                    matrix[i - 1, j - 1]
-                    + self.__get_substitution_cost(word1, word2, i, j),
-                )
-        return matrix
+    def __init__(self, words):
+        # A node is [word, position in words, {distance: child node}]
+        self.root = None
+        for position, word in enumerate(words):
+            self.add(word, position)
+
+    def add(self, word, position):
+        if self.root is None:
+            self.root = [word, position, {}]
+            return
+        node = self.root
+        while True:
+            distance = weighted_edit_distance(word, node[0])
+            if distance == 0:
+                return
+            if distance not in node[2]:
+                node[2][distance] = [word, position, {}]
+                return
+            node = node[2][distance]
+
+    def search(self, word, radius):
+        """Returns [(distance, position, word), ...] of the words closer than radius."""
+        matches = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_word, position, children = stack.pop()
+            # Beyond this, neither the node nor any child can be within radius
+            cutoff = max(children, default=0) + radius
+            distance = weighted_edit_distance(word, node_word, cutoff)
+            if distance < radius:
+                matches.append((distance, position, node_word))
+            for edge, child in children.items():
+                if abs(distance - edge) < radius:
+                    stack.append(child)
+        return matches
+
+
+# Built once at import and shared by every corrector
+FLAVOR_TREE = BKTree([flavor.lower() for flavor in FLAVOR_KEYWORDS])
+
+
+class FlavorTypoCorrector:
+    def __init__(self, threshold, memo_size=4096):
+        self.threshold = threshold
+        # Corrections are pure, so they are memoized per input
+        self.correct = lru_cache(maxsize=memo_size)(self._correct)
 
-    def __get_minimum_edit_distance(self, word1, word2):
-        word1 = word1.lower()
-        word2 = word2.lower()
-        matrix = self.__get_minimum_edit_distance_matrix(word1, word2)
-        return matrix[len(word1), len(word2)]
+    def _correct(self, user_input):
+        """Returns the flavor keyword closest to user_input if it is closer than
+        threshold, else user_input. Ties go to the keyword listed first."""
+        matches = FLAVOR_TREE.search(user_input.lower(), self.threshold)
+        if not matches:
+            return user_input
+        return FLAVOR_KEYWORDS[min(matches)[1]]
 
     def get_replaced_flavor_list(self, user_input_list):
-        output = user_input_list.copy()
-        for i, user_input in enumerate(user_input_list):
-            minimum_edit_distance_value = float("inf")
-            minimum_edit_distance_word = ""
-            for flavor in FLAVOR_KEYWORDS:
-                current_minimum_edit_distance_value = self.__get_minimum_edit_distance(
-                    user_input, flavor
-                )
-                if current_minimum_edit_distance_value < minimum_edit_distance_value:
-                    minimum_edit_distance_value = current_minimum_edit_distance_value
-                    minimum_edit_distance_word = flavor
-            if minimum_edit_distance_value < self.threshold:
-                output[i] = minimum_edit_distance_word
-        return output
+        return [self.correct(user_input) for user_input in user_input_list]
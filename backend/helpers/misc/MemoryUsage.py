@@ -0,0 +1,56 @@
+import os
+import sys
+
+def get_rss_mb():
+    """Returns the resident set size of the current process in MB."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # No /proc (e.g. macOS): fall back to the peak RSS
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def get_memory_breakdown_mb():
+    """Returns {"rss", "pss", "shared", "private"} in MB for the current process.
+
+    PSS splits every shared page evenly between the processes mapping it, so
+    summing it over the gunicorn workers gives their real combined footprint.
+    Only rss is available where /proc/self/smaps_rollup is not (non-Linux).
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as rollup:
+            for line in rollup:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return {"rss": get_rss_mb()}
+
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+def print_process_memory_usage(label):
+    """Prints the RSS/PSS/shared/private split of the current process."""
+    breakdown = get_memory_breakdown_mb()
+    print("Memory usage {} (pid {}): ".format(label, os.getpid())
+          + ", ".join("{} {:.1f} MB".format(name.upper(), value) for name, value in breakdown.items()))
+
+def print_memory_usage(label, sizes=None):
+    """Prints the process RSS followed by the size of each named structure in sizes."""
+    print("Memory usage {} (pid {}): RSS {:.1f} MB".format(label, os.getpid(), get_rss_mb()))
+    for name, nbytes in (sizes or {}).items():
+        print("    {}: {:.1f} MB".format(name, nbytes / (1024 * 1024)))
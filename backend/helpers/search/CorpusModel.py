@@ -0,0 +1,92 @@
+import time
+import hashlib
+
+from helpers.search.CosineScorer import CosineScorer
+from helpers.search.WineNameTable import WineNameTable
+
+class CorpusModel:
+    """Read-only TF-IDF model of the review corpus.
+
+    One instance is built (or loaded from the on-disk index, see IndexStore)
+    per process at startup by SimilarWines.initialize_corpus_model, and every
+    SimilarWines query object only references it. Nothing in here is ever
+    rebuilt or mutated per request.
+
+    Apart from the wine and term tables, all bulk data lives in flat NumPy
+    arrays indexed by wine id or term id, which may be memory-mapped:
+      - wine_table: wine id <-> wine name (WineNameTable)
+      - vocabulary: term id <-> term (Vocabulary)
+      - postings: term x wine CSR matrix of term counts
+      - wine_term_matrix: the same counts as a wine x term CSR matrix
+      - idf_array: float32 idf per term id, NaN for terms filtered by compute_idf
+      - doc_norms: float32 tf-idf norm per wine
+      - scorer: CosineScorer over the precomputed unit-length wine vectors
+    """
+    __slots__ = (
+        "version",
+        "wine_table",
+        "vocabulary",
+        "postings",
+        "wine_term_matrix",
+        "idf_array",
+        "doc_norms",
+        "scorer",
+    )
+
+    def __init__(self, wine_names, vocabulary, postings, idf_array, doc_norms, wine_term_matrix=None, scorer=None, version=None):
+        start_time = time.time()
+
+        if wine_term_matrix is None:
+            wine_term_matrix = postings.transpose()
+        if scorer is None:
+            scorer = CosineScorer.from_postings(postings, idf_array, doc_norms)
+        if version is None:
+            version = self.compute_version(wine_names, postings)
+        idf_array.flags.writeable = False
+        doc_norms.flags.writeable = False
+
+        self._set("version", version)
+        self._set("wine_table", WineNameTable(wine_names))
+        self._set("vocabulary", vocabulary)
+        self._set("postings", postings)
+        self._set("wine_term_matrix", wine_term_matrix)
+        self._set("idf_array", idf_array)
+        self._set("doc_norms", doc_norms)
+        self._set("scorer", scorer)
+
+        end_time = time.time()
+        print("Time taken for building CorpusModel: {:.4f} seconds".format(end_time - start_time))
+
+    @staticmethod
+    def compute_version(wine_names, postings):
+        """Content hash identifying this corpus, used to detect stale derived data."""
+        digest = hashlib.sha1()
+        digest.update("\0".join(wine_names).encode("utf-8"))
+        digest.update(postings.indptr.tobytes())
+        digest.update(postings.indices.tobytes())
+        digest.update(postings.data.tobytes())
+        return digest.hexdigest()[:16]
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CorpusModel is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CorpusModel is immutable")
+
+    @property
+    def n_docs(self):
+        return len(self.wine_table)
+
+    def memory_usage(self):
+        """Returns {structure name: bytes} for the array-backed parts of the model."""
+        n_docs, n_terms = self.wine_term_matrix.shape
+        return {
+            "postings (CSR, {} nnz)".format(self.postings.nnz): self.postings.nbytes,
+            "wine_term_matrix (CSR, {} nnz)".format(self.wine_term_matrix.nnz): self.wine_term_matrix.nbytes,
+            "wine_term_matrix (dense equivalent)": n_docs * n_terms * 8,
+            "scorer weight matrix (CSR, {} nnz)".format(self.scorer.weight_matrix.nnz): self.scorer.nbytes,
+            "idf + doc_norms": self.idf_array.nbytes + self.doc_norms.nbytes,
+        }
@@ -0,0 +1,83 @@
+import time
+import numpy as np
+
+from helpers.search.SparseMatrix import CSRMatrix
+
+class CosineScorer:
+    """Vectorized cosine similarity over precomputed tf-idf document vectors.
+
+    The weight matrix is term-major: row t holds, for every wine containing t,
+    tf * idf[t] / doc_norms[wine]. Document vectors are therefore already
+    idf-weighted and unit length, so scoring a query is one sparse
+    matrix-vector product followed by a division by the query norm.
+    """
+
+    def __init__(self, weight_matrix):
+        self.weight_matrix = weight_matrix
+
+    @classmethod
+    def from_postings(cls, postings, idf, doc_norms):
+        """Builds the scorer from the term x wine tf matrix.
+
+        idf is indexed by term id; terms filtered out by min_df / max_df_ratio
+        have a NaN idf and get empty rows. The weights are computed in float64.
+        """
+        start_time = time.time()
+
+        has_idf = ~np.isnan(idf)
+        row_ids = postings.row_ids()
+        keep = has_idf[row_ids]
+        data = postings.data[keep].astype(np.float64) * idf[row_ids[keep]] / doc_norms[postings.indices[keep]]
+        indptr = np.zeros(postings.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.diff(postings.indptr) * has_idf, out=indptr[1:])
+
+        weight_matrix = CSRMatrix(indptr, postings.indices[keep], data, postings.shape, data_dtype=np.float64)
+        end_time = time.time()
+        print("Time taken for building CosineScorer: {:.4f} seconds".format(end_time - start_time))
+        return cls(weight_matrix)
+
+    @property
+    def nbytes(self):
+        return self.weight_matrix.nbytes
+
+    @staticmethod
+    def _query_norm(weights):
+        query_norm = np.sqrt(np.sum(weights ** 2))
+        if query_norm == 0:
+            query_norm = 1
+        return query_norm
+
+    def score(self, term_ids, weights):
+        """Returns the cosine similarity of every wine to the query {term_ids[k]: weights[k]}.
+
+        weights are idf-weighted query term weights (count * idf).
+        """
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        scores = self.weight_matrix.weighted_row_sum(term_ids, weights)
+        scores /= self._query_norm(weights)
+        return scores
+
+    @staticmethod
+    def top_k(scores, k=None):
+        """Returns [(score, doc_id), ...] for the k best positive scores.
+
+        Ordered by descending score, ties broken by ascending doc_id.
+        """
+        candidates = np.flatnonzero(scores > 0)
+        if k is not None and k < len(candidates):
+            candidate_scores = scores[candidates]
+            kth_score = candidate_scores[np.argpartition(-candidate_scores, k - 1)[k - 1]]
+            above = candidates[candidate_scores > kth_score]
+            # candidates is ascending, so ties at the cut keep the lowest doc ids
+            tied = candidates[candidate_scores == kth_score][:k - len(above)]
+            candidates = np.concatenate([above, tied])
+
+        # lexsort sorts by the last key first
+        order = np.lexsort((candidates, -scores[candidates]))
+        ranked = candidates[order]
+        return list(zip(scores[ranked].tolist(), ranked.tolist()))
+
+    def rank(self, term_ids, weights, k=None):
+        """Returns the k best [(score, doc_id), ...] for the query (all positive scores if k is None)."""
+        return self.top_k(self.score(term_ids, weights), k)
@@ -0,0 +1,112 @@
+import time
+from itertools import islice
+import numpy as np
+
+from helpers.search.WineFilterIndex import normalize_key
+
+# Varietals that suit each mood of the varietal suggestions (matched as substrings)
+MOOD_VARIETALS = {
+    "chill": ['Sauvignon Blanc', 'Riesling', 'Chardonnay', 'Pinot Gris', 'Pinot Grigio', 'Beaujolais', 'Pinot Noir', 'Tempranillo'],
+    "sad": ['Pinot Noir', 'Rioja', 'Valpolicella'],
+    "sexy": ['Cote du Rhone', 'Chateauneuf-du-Pape', 'Pinot Noir', 'Chambolle-Musigny', 'Barbaresco'],
+    "angry": ['Sauvignon Blanc', 'Albarino', 'Verdelho', 'Champagne', 'Moscato', 'Chassagne', 'Puligny-Montrachet', 'Meursault'],
+    "wild": ['Syrah', 'Zinfandel', 'Greco di Tufo', 'Nero d\'Avola', 'Aglianico'],
+    "low": ['Sauvignon Blanc', 'Zinfandel', 'Valpolicella', 'Pinot Noir', 'Vosne-Romanée', 'New Zealand Pinot'],
+}
+
+class FacetCatalog:
+    """Distinct varietals and appellations of a WineMetadataStore, for the
+    /suggest_varietals and /suggest_regions suggestions.
+
+    - varietals: distinct values in table order, with their lookup key
+      (normalize_key) and a bitmask of the moods they suit (bit i for the
+      i-th mood of MOOD_VARIETALS)
+    - appellations: distinct values in table order, overall and per country
+      (keyed by normalize_key), with their first word ("Napa Valley, CA" ->
+      "Napa")
+    Suggestions are answered like the former SELECT DISTINCT ... LIKE
+    '%input%' LIMIT 30 queries, but deduplicated in table order instead of
+    through a set.
+    """
+    # Distinct values the former queries returned (LIMIT), and suggestions returned out of them
+    VALUE_LIMIT = 30
+    SUGGESTION_LIMIT = 6
+    # varietal_lower keeps the first 255 characters
+    KEY_LENGTH = 255
+
+    def __init__(self, store):
+        start_time = time.time()
+
+        self.varietals = store.categories["varietal"]
+        self.varietal_keys = [normalize_key(varietal[:self.KEY_LENGTH]) for varietal in self.varietals]
+        self.varietal_moods = [self.mood_mask_of(varietal) for varietal in self.varietals]
+
+        appellations = store.categories["appellation"]
+        self.appellation_keys = [normalize_key(appellation) for appellation in appellations]
+        self.appellation_prefixes = [self.first_word(appellation) for appellation in appellations]
+
+        # Distinct (country, appellation) pairs in order of first appearance
+        n_appellations = max(len(appellations), 1)
+        country_codes, appellation_codes = store.codes["country"], store.codes["appellation"]
+        both = (country_codes >= 0) & (appellation_codes >= 0)
+        pairs = country_codes[both].astype(np.int64) * n_appellations + appellation_codes[both]
+        _, first_rows = np.unique(pairs, return_index=True)
+        self.country_appellation_codes = {}
+        for pair in pairs[np.sort(first_rows)].tolist():
+            country = normalize_key(store.categories["country"][pair // n_appellations])
+            self.country_appellation_codes.setdefault(country, []).append(pair % n_appellations)
+
+        end_time = time.time()
+        print("Time taken for building FacetCatalog: {:.4f} seconds".format(end_time - start_time))
+
+    @staticmethod
+    def mood_mask_of(varietal):
+        mask = 0
+        for bit, mood_varietals in enumerate(MOOD_VARIETALS.values()):
+            if any(mood_varietal in varietal for mood_varietal in mood_varietals):
+                mask |= 1 << bit
+        return mask
+
+    @staticmethod
+    def mood_mask(moods):
+        """Returns the bitmask of the named moods."""
+        return sum(1 << bit for bit, mood in enumerate(MOOD_VARIETALS) if mood in moods)
+
+    @staticmethod
+    def first_word(appellation):
+        words = appellation.split()
+        return words[0].rstrip(",") if words else None
+
+    def suggest_varietals(self, input, moods=()):
+        """Returns up to SUGGESTION_LIMIT varietals containing input that suit
+        any of moods (all varietals if no mood is given)."""
+        key = normalize_key(input or "")
+        matches = list(islice((i for i, varietal_key in enumerate(self.varietal_keys) if key in varietal_key), self.VALUE_LIMIT))
+
+        mask = self.mood_mask(moods)
+        if mask:
+            matches = [i for i in matches if self.varietal_moods[i] & mask]
+        return [self.varietals[i] for i in matches[:self.SUGGESTION_LIMIT]]
+
+    def suggest_regions(self, country, input):
+        """Returns up to SUGGESTION_LIMIT distinct first words of the
+        appellations of country ("all" for every country) containing input."""
+        if country == "all":
+            codes = range(len(self.appellation_keys))
+        elif country is None:
+            codes = []
+        else:
+            codes = self.country_appellation_codes.get(normalize_key(country), [])
+
+        if input:
+            key = normalize_key(input)
+            codes = (code for code in codes if key in self.appellation_keys[code])
+
+        suggestions = []
+        for n, code in enumerate(codes):
+            if n >= self.VALUE_LIMIT or len(suggestions) >= self.SUGGESTION_LIMIT:
+                break
+            prefix = self.appellation_prefixes[code]
+            if prefix is not None and prefix not in suggestions:
+                suggestions.append(prefix)
+        return suggestions
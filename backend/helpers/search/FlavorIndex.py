@@ -0,0 +1,220 @@
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left
+import numpy as np
+
+from helpers.search.Tokenizer import Tokenizer
+from helpers.search.SparseMatrix import CSRMatrix
+from helpers.search.prefixRange import prefix_range
+
+# A word as boolean_search's \b patterns see it: a maximal run of word characters
+WORD_RUN_PATTERN = re.compile(r'(\w+)')
+# Keywords match_counts answers: words separated by single spaces
+PHRASE_PATTERN = re.compile(r'\w+(?: \w+)*')
+
+class FlavorIndex:
+    """Row-level positional inverted index of the reviews of a
+    WineMetadataStore, for the flavor matching of boolean_search.
+
+    - terms: the distinct lowercase word runs of all reviews (digits and
+      underscores are part of words), sorted, so the terms starting with a
+      prefix are one contiguous range of term ids
+    - postings: term x row CSRMatrix of occurrence counts
+    - positions: the word positions of every posting, delta-encoded (the
+      first position, then the gaps) as variable-length bytes, 7 bits per
+      byte with the high bit set on all but the last byte of a value. The
+      postings of a term are stored back to back, those of term t being
+      positions[position_indptr[t]:position_indptr[t + 1]], and each holds
+      as many values as its count
+    - single_spaces: packed bit per word of the corpus, set if the next word
+      of the review follows after exactly one space
+    - row_offsets: corpus-wide index of the first word of every row
+    Rows are the store's rows, so every row is matched against its own
+    review (a wine's rows can have different reviews). Once built, no review
+    text is needed to match single words or phrases.
+    """
+
+    def __init__(self, reviews):
+        start_time = time.time()
+
+        # Term ids are interned in order of first appearance
+        tokenizer = Tokenizer()
+        intern = tokenizer.intern
+        term_ids = array('i')
+        single_spaces = bytearray()
+        self.n_rows = len(reviews)
+        self.row_offsets = np.zeros(self.n_rows + 1, dtype=np.int64)
+        for row, review in enumerate(reviews):
+            # Split around the words: separators and words alternate, starting and ending with a separator
+            parts = WORD_RUN_PATTERN.split(review or "")
+            words = parts[1::2]
+            term_ids.extend([intern(word.lower()) for word in words])
+            single_spaces.extend([gap == " " for gap in parts[2:-1:2]])
+            if words:
+                single_spaces.append(False)
+            self.row_offsets[row + 1] = len(term_ids)
+        self.single_spaces = np.packbits(np.frombuffer(bytes(single_spaces), dtype=np.uint8))
+
+        # Renumber the terms in sorted order
+        order = sorted(range(len(tokenizer.terms)), key=tokenizer.terms.__getitem__)
+        self.terms = [tokenizer.terms[term_id] for term_id in order]
+        sorted_ids = np.zeros(len(order), dtype=np.int64)
+        sorted_ids[order] = np.arange(len(order))
+
+        # Stable: the words of every term stay ordered by row, then position
+        word_terms = sorted_ids[np.frombuffer(term_ids, dtype=np.int32)] if len(term_ids) else np.zeros(0, dtype=np.int64)
+        word_order = np.argsort(word_terms, kind="stable")
+        word_rows = np.repeat(np.arange(self.n_rows, dtype=np.int64), np.diff(self.row_offsets))[word_order]
+        word_positions = word_order - self.row_offsets[word_rows]
+        word_terms = word_terms[word_order]
+
+        # A posting is a run of words of the same term and row
+        keys = word_terms * max(self.n_rows, 1) + word_rows
+        posting_starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+        counts = np.diff(np.r_[posting_starts, len(keys)])
+        indptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(word_terms[posting_starts], minlength=len(self.terms)), out=indptr[1:])
+        # A word occurs far fewer than 65536 times in one review
+        self.postings = CSRMatrix(indptr, word_rows[posting_starts], counts, (len(self.terms), self.n_rows), data_dtype=np.uint16)
+
+        # Delta-encode the positions within every posting
+        deltas = word_positions.copy()
+        deltas[1:] -= word_positions[:-1]
+        deltas[posting_starts] = word_positions[posting_starts]
+        self.positions, value_sizes = self.encode_varint(deltas)
+        self.position_indptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        term_sizes = np.bincount(word_terms, weights=value_sizes, minlength=len(self.terms)).astype(np.int64)
+        np.cumsum(term_sizes, out=self.position_indptr[1:])
+        self.n_words = len(word_terms)
+
+        end_time = time.time()
+        print("Time taken for building FlavorIndex: {:.4f} seconds".format(end_time - start_time))
+
+    @staticmethod
+    def encode_varint(values):
+        """Returns (uint8 varint encoding of the non-negative values, bytes per value)."""
+        sizes = np.ones(len(values), dtype=np.int64)
+        for shift in (7, 14, 21, 28, 35):
+            sizes += values >= (1 << shift)
+        value_index = np.repeat(np.arange(len(values)), sizes)
+        value_starts = np.zeros(len(values), dtype=np.int64)
+        np.cumsum(sizes[:-1], out=value_starts[1:])
+        byte_index = np.arange(len(value_index)) - value_starts[value_index]
+        encoded = (values[value_index] >> (7 * byte_index)) & 0x7f
+        encoded |= np.where(byte_index < sizes[value_index] - 1, 0x80, 0)
+        return encoded.astype(np.uint8), sizes
+
+    @staticmethod
+    def decode_varint(encoded):
+        """Returns the int64 values of a uint8 varint encoding."""
+        if len(encoded) == 0 or encoded.max() < 0x80:
+            return encoded.astype(np.int64)
+        ends = encoded < 0x80
+        value_index = np.cumsum(ends) - ends
+        value_starts = np.flatnonzero(np.r_[True, ends[:-1]])
+        byte_index = np.arange(len(encoded)) - value_starts[value_index]
+        parts = (encoded & 0x7f).astype(np.int64) << (7 * byte_index)
+        return np.bincount(value_index, weights=parts, minlength=len(value_starts)).astype(np.int64)
+
+    @staticmethod
+    def can_match(keyword):
+        """Whether match_counts answers keyword: words separated by single spaces, or empty."""
+        return keyword == "" or PHRASE_PATTERN.fullmatch(keyword) is not None
+
+    def term_range(self, prefix):
+        """Returns (start, end) of the term ids starting with prefix."""
+        return prefix_range(self.terms, prefix)
+
+    def word_range(self, word):
+        """Returns (start, end) of the term id of word (empty if it never occurs)."""
+        start = bisect_left(self.terms, word)
+        return start, start + (start < len(self.terms) and self.terms[start] == word)
+
+    def range_counts(self, start, end):
+        """Returns the occurrences of the terms start..end - 1 in every row,
+        as a dense int64 array: the union of their postings."""
+        begin, stop = self.postings.indptr[start], self.postings.indptr[end]
+        return np.bincount(self.postings.indices[begin:stop], weights=self.postings.data[begin:stop], minlength=self.n_rows).astype(np.int64)
+
+    def range_words(self, start, end):
+        """Returns the corpus-wide word indexes of the occurrences of the
+        terms start..end - 1, decoded from their positions."""
+        begin, stop = self.postings.indptr[start], self.postings.indptr[end]
+        counts = self.postings.data[begin:stop].astype(np.int64)
+        deltas = self.decode_varint(self.positions[self.position_indptr[start]:self.position_indptr[end]])
+
+        # Undo the delta encoding: running sums, restarted at every posting
+        sums = np.cumsum(deltas)
+        restarts = np.zeros(len(counts), dtype=np.int64)
+        np.cumsum(counts[:-1], out=restarts[1:])
+        positions = sums - np.repeat(sums[restarts] - deltas[restarts], counts) if len(counts) else sums
+        return np.repeat(self.row_offsets[self.postings.indices[begin:stop]], counts) + positions
+
+    def is_single_space(self, word_indexes):
+        """Returns whether each of the corpus-wide word_indexes is followed by exactly one space and a word."""
+        return (self.single_spaces[word_indexes >> 3] >> (7 - (word_indexes & 7))) & 1 == 1
+
+    def phrase_counts(self, words, prefix=False):
+        """Returns the non-overlapping occurrences of the phrase words in every
+        row, as a dense int64 array. Consecutive words of an occurrence follow
+        each other after exactly one space; with prefix, its last word only has
+        to start with words[-1].
+        """
+        starts = None
+        for i, word in enumerate(words):
+            start, end = self.term_range(word) if prefix and i == len(words) - 1 else self.word_range(word)
+            word_starts = self.range_words(start, end) - i
+            starts = word_starts if starts is None else starts[np.isin(starts, word_starts)]
+        starts = np.sort(starts)
+        for i in range(len(words) - 1):
+            starts = starts[self.is_single_space(starts + i)]
+
+        # Like a regex scan, an occurrence overlapping the previous one does not count
+        if len(words) > 1 and np.any(np.diff(starts) < len(words)):
+            kept, last = [], -len(words)
+            for start in starts.tolist():
+                if start >= last + len(words):
+                    kept.append(start)
+                    last = start
+            starts = np.array(kept, dtype=np.int64)
+
+        rows = np.searchsorted(self.row_offsets, starts, side="right") - 1
+        return np.bincount(rows, minlength=self.n_rows).astype(np.int64)
+
+    def match_counts(self, keyword):
+        """Returns (exact, prefix) counts of keyword in every row, as dense
+        int64 arrays. They are the numbers of matches of boolean_search's
+        patterns, case-insensitively:
+          - exact: \\bkeyword\\b, the words (or phrases) equal to keyword
+          - prefix: \\bkeyword[\\w]*\\b, the same, but the last word only has
+            to start with the keyword's last word
+        The empty keyword matches twice per word with both patterns (once at
+        either boundary).
+        """
+        if keyword == "":
+            counts = 2 * np.diff(self.row_offsets)
+            return counts, counts
+
+        words = keyword.lower().split(" ")
+        if len(words) > 1:
+            return self.phrase_counts(words), self.phrase_counts(words, prefix=True)
+
+        start, end = self.term_range(words[0])
+        return self.range_counts(*self.word_range(words[0])), self.range_counts(start, end)
+
+    @property
+    def nbytes(self):
+        return self.postings.nbytes + self.positions.nbytes + self.position_indptr.nbytes + self.single_spaces.nbytes + self.row_offsets.nbytes
+
+    def memory_usage(self, reviews):
+        """Returns {structure name: bytes} for the index, next to the raw
+        review strings it replaces for matching."""
+        return {
+            "reviews (raw strings)": sum(sys.getsizeof(review) for review in reviews if review is not None),
+            "flavor postings (CSR, {} nnz)".format(self.postings.nnz): self.postings.nbytes,
+            "flavor positions (delta-encoded, {} words)".format(self.n_words): self.positions.nbytes + self.position_indptr.nbytes,
+            "flavor positions (int32 equivalent)": self.n_words * 4,
+            "single spaces + row offsets": self.single_spaces.nbytes + self.row_offsets.nbytes,
+        }
@@ -0,0 +1,192 @@
+import os
+import json
+import mmap
+import struct
+import time
+import numpy as np
+
+from helpers.search.SparseMatrix import CSRMatrix
+from helpers.search.CosineScorer import CosineScorer
+from helpers.search.CorpusModel import CorpusModel
+from helpers.search.Vocabulary import Vocabulary
+
+# Built by build_index.py, read by SimilarWines.initialize_corpus_model
+DEFAULT_INDEX_PATH = os.environ.get(
+    "WINE_INDEX_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'wine_index.bin')),
+)
+
+class IndexFormatError(ValueError):
+    pass
+
+class IndexStore:
+    """Versioned binary file format for a CorpusModel.
+
+    Layout:
+        MAGIC (8 bytes) | header length (uint64, little endian) | JSON header | sections
+
+    The JSON header holds the format version, the corpus version, the
+    checksum of the table it was built from (if known) and, for each
+    section, its dtype, length and byte offset from the first section (which
+    starts at the first 8-byte boundary after the header). Sections are raw
+    little-endian arrays aligned to 8 bytes, so loading is a
+    read-only mmap plus zero-copy np.frombuffer views: startup takes
+    milliseconds and every process mapping the file shares its pages through
+    the OS page cache.
+    """
+    MAGIC = b"WINEIDX\0"
+    FORMAT_VERSION = 2
+    ALIGNMENT = 8
+
+    @staticmethod
+    def _encode_strings(strings):
+        """Encodes a list of str as (utf-8 blob, int64 offsets of length n + 1)."""
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    @staticmethod
+    def _decode_strings(blob, offsets):
+        data = blob.tobytes()
+        offsets = offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    @classmethod
+    def _sections(cls, corpus_model):
+        wine_names_blob, wine_names_offsets = cls._encode_strings(corpus_model.wine_table.names)
+        terms_blob, terms_offsets = cls._encode_strings(corpus_model.vocabulary.terms)
+        weight_matrix = corpus_model.scorer.weight_matrix
+        return [
+            ("wine_names_blob", wine_names_blob),
+            ("wine_names_offsets", wine_names_offsets),
+            ("terms_blob", terms_blob),
+            ("terms_offsets", terms_offsets),
+            ("postings_indptr", corpus_model.postings.indptr),
+            ("postings_indices", corpus_model.postings.indices),
+            ("postings_data", corpus_model.postings.data),
+            ("wine_term_indptr", corpus_model.wine_term_matrix.indptr),
+            ("wine_term_indices", corpus_model.wine_term_matrix.indices),
+            ("wine_term_data", corpus_model.wine_term_matrix.data),
+            ("weights_indptr", weight_matrix.indptr),
+            ("weights_indices", weight_matrix.indices),
+            ("weights_data", weight_matrix.data),
+            ("idf", corpus_model.idf_array),
+            ("doc_norms", corpus_model.doc_norms),
+        ]
+
+    @classmethod
+    def write_file(cls, path, magic, header, sections):
+        """Writes magic, header (plus the section table) and the named arrays
+        in sections to path, atomically via a temporary file."""
+        sections = [(name, np.ascontiguousarray(array).astype(array.dtype.newbyteorder("<"), copy=False))
+                    for name, array in sections]
+        header = dict(header, sections={})
+
+        offset = 0
+        for name, array in sections:
+            header["sections"][name] = {"dtype": array.dtype.str, "count": len(array), "offset": offset}
+            offset = cls._align(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = cls._align(len(magic) + 8 + len(header_bytes))
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(magic)
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in sections:
+                f.seek(data_start + header["sections"][name]["offset"])
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read_file(cls, path, magic, format_version, description="wine index"):
+        """Memory-maps a file written by write_file and returns (header, {section name: array}).
+
+        Raises IndexFormatError if the file does not start with magic or has
+        another format version.
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if mapped[:len(magic)] != magic:
+            raise IndexFormatError("{} is not a {} file".format(path, description))
+        header_start = len(magic) + 8
+        header_size = struct.unpack("<Q", mapped[len(magic):header_start])[0]
+        header = json.loads(mapped[header_start:header_start + header_size].decode("utf-8"))
+        if header["format_version"] != format_version:
+            raise IndexFormatError("{} has format version {}, expected {}".format(path, header["format_version"], format_version))
+        data_start = cls._align(header_start + header_size)
+
+        arrays = {}
+        for name, section in header["sections"].items():
+            arrays[name] = np.frombuffer(mapped, dtype=np.dtype(section["dtype"]), count=section["count"], offset=data_start + section["offset"])
+        return header, arrays
+
+    @classmethod
+    def save(cls, corpus_model, path=DEFAULT_INDEX_PATH, source_checksum=None):
+        """Writes corpus_model to path (atomically, via a temporary file).
+
+        source_checksum is the checksum of the table the model was built from
+        (see SimilarWines.corpus_checksum).
+        """
+        start_time = time.time()
+
+        header = {
+            "format_version": cls.FORMAT_VERSION,
+            "corpus_version": corpus_model.version,
+            "source_checksum": source_checksum,
+            "n_docs": corpus_model.n_docs,
+            "n_terms": len(corpus_model.vocabulary),
+        }
+        cls.write_file(path, cls.MAGIC, header, cls._sections(corpus_model))
+
+        end_time = time.time()
+        print("Time taken for saving index to {}: {:.4f} seconds ({:.1f} MB)".format(path, end_time - start_time, os.path.getsize(path) / (1024 * 1024)))
+
+    @classmethod
+    def _align(cls, n):
+        return (n + cls.ALIGNMENT - 1) // cls.ALIGNMENT * cls.ALIGNMENT
+
+    @classmethod
+    def source_checksum(cls, path=DEFAULT_INDEX_PATH):
+        """Returns the table checksum the index at path was built from, or
+        None if there is no readable index or it has none."""
+        if not os.path.exists(path):
+            return None
+        try:
+            header, _ = cls.read_file(path, cls.MAGIC, cls.FORMAT_VERSION)
+        except IndexFormatError:
+            return None
+        return header.get("source_checksum")
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        """Memory-maps the index at path read-only and returns its CorpusModel.
+
+        Raises IndexFormatError if the file is not an index of this format version.
+        """
+        start_time = time.time()
+
+        header, arrays = cls.read_file(path, cls.MAGIC, cls.FORMAT_VERSION)
+
+        n_docs, n_terms = header["n_docs"], header["n_terms"]
+        postings = CSRMatrix(arrays["postings_indptr"], arrays["postings_indices"], arrays["postings_data"], (n_terms, n_docs))
+        wine_term_matrix = CSRMatrix(arrays["wine_term_indptr"], arrays["wine_term_indices"], arrays["wine_term_data"], (n_docs, n_terms))
+        weight_matrix = CSRMatrix(arrays["weights_indptr"], arrays["weights_indices"], arrays["weights_data"], (n_terms, n_docs), data_dtype=np.float64)
+
+        corpus_model = CorpusModel(
+            cls._decode_strings(arrays["wine_names_blob"], arrays["wine_names_offsets"]),
+            Vocabulary(cls._decode_strings(arrays["terms_blob"], arrays["terms_offsets"])),
+            postings,
+            arrays["idf"],
+            arrays["doc_norms"],
+            wine_term_matrix=wine_term_matrix,
+            scorer=CosineScorer(weight_matrix),
+            version=header["corpus_version"],
+        )
+
+        end_time = time.time()
+        print("Time taken for loading index from {}: {:.4f} seconds".format(path, end_time - start_time))
+        return corpus_model
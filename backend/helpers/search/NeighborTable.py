@@ -0,0 +1,70 @@
+import os
+import time
+
+from helpers.search.IndexStore import IndexStore
+
+# Built by build_neighbors.py, read by SimilarWines.initialize_neighbor_table
+DEFAULT_NEIGHBORS_PATH = os.environ.get(
+    "WINE_NEIGHBORS_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'wine_neighbors.bin')),
+)
+
+class NeighborTable:
+    """Precomputed top-n_neighbors ranking of every wine used as a seed.
+
+    The ranking of wine id w is ids/scores[indptr[w]:indptr[w + 1]]: exactly
+    what SimilarWines returns for a search seeded by w alone with
+    k=n_neighbors, i.e. ordered by descending score, then ascending doc id,
+    positive scores only. Any k up to n_neighbors is a prefix of it.
+
+    Saved in the IndexStore file layout (memory-mapped on load) and tied to
+    the corpus version of the index it was computed from.
+    """
+    MAGIC = b"WINENBR\0"
+    FORMAT_VERSION = 1
+
+    def __init__(self, indptr, ids, scores, n_neighbors, version):
+        self.indptr = indptr
+        self.ids = ids
+        self.scores = scores
+        self.n_neighbors = n_neighbors
+        self.version = version
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def ranking(self, wine_id, k=None):
+        """Returns the k best [(score, doc_id), ...] for the seed wine_id."""
+        start, end = self.indptr[wine_id], self.indptr[wine_id + 1]
+        if k is not None:
+            end = min(end, start + k)
+        return list(zip(self.scores[start:end].tolist(), self.ids[start:end].tolist()))
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.ids.nbytes + self.scores.nbytes
+
+    def save(self, path=DEFAULT_NEIGHBORS_PATH):
+        start_time = time.time()
+        header = {
+            "format_version": self.FORMAT_VERSION,
+            "corpus_version": self.version,
+            "n_docs": len(self),
+            "n_neighbors": self.n_neighbors,
+        }
+        IndexStore.write_file(path, self.MAGIC, header, [
+            ("indptr", self.indptr),
+            ("ids", self.ids),
+            ("scores", self.scores),
+        ])
+        end_time = time.time()
+        print("Time taken for saving neighbor table to {}: {:.4f} seconds ({:.1f} MB)".format(path, end_time - start_time, os.path.getsize(path) / (1024 * 1024)))
+
+    @classmethod
+    def load(cls, path=DEFAULT_NEIGHBORS_PATH):
+        """Memory-maps the table at path read-only.
+
+        Raises IndexFormatError if the file is not a table of this format version.
+        """
+        header, arrays = IndexStore.read_file(path, cls.MAGIC, cls.FORMAT_VERSION, "wine neighbor table")
+        return cls(arrays["indptr"], arrays["ids"], arrays["scores"], header["n_neighbors"], header["corpus_version"])
@@ -0,0 +1,153 @@
+import time
+import multiprocessing
+import numpy as np
+
+from helpers.search.IndexStore import IndexStore
+from helpers.search.CosineScorer import CosineScorer
+from helpers.search.SparseMatrix import CSRMatrix
+from helpers.search.NeighborTable import NeighborTable
+from helpers.search.ParallelIndexBuilder import default_worker_count
+from helpers.search.WineFilterIndex import normalize_key
+
+# State of a worker process, set once by init_worker
+_worker = {}
+
+def init_worker(index_path, seed_queries, n_neighbors):
+    # The index is memory-mapped, so every worker shares its pages
+    _worker["weight_matrix"] = IndexStore.load(index_path).scorer.weight_matrix
+    _worker["seed_queries"] = seed_queries
+    _worker["n_neighbors"] = n_neighbors
+
+def score_block(task):
+    """Ranks the seeds start..end - 1 against every wine.
+
+    The block's query vectors are multiplied with the weight matrix in one
+    sparse product: every (seed, term) pair is expanded to the term's
+    postings and summed into a dense block x n_docs score matrix with one
+    bincount. Entries are summed in the same order as CosineScorer.score sums
+    them for a single query, so the scores (and ranks) are bit-identical.
+
+    Returns (start, ranking length per seed, doc ids, scores).
+    """
+    start, end = task
+    weight_matrix = _worker["weight_matrix"]
+    seed_queries = _worker["seed_queries"]
+    n_docs = weight_matrix.shape[1]
+
+    q_start, q_end = seed_queries.indptr[start], seed_queries.indptr[end]
+    term_ids = seed_queries.indices[q_start:q_end].astype(np.int64)
+    weights = seed_queries.data[q_start:q_end]
+    local_seeds = np.repeat(np.arange(end - start, dtype=np.int64), np.diff(seed_queries.indptr[start:end + 1]))
+
+    # Positions of the postings of every (seed, term) pair, concatenated
+    starts, lengths = weight_matrix.indptr[term_ids], np.diff(weight_matrix.indptr)[term_ids]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    positions = np.arange(offsets[-1], dtype=np.int64) + np.repeat(starts - offsets[:-1], lengths)
+
+    values = weight_matrix.data[positions] * np.repeat(weights, lengths)
+    cells = np.repeat(local_seeds, lengths) * n_docs + weight_matrix.indices[positions]
+    scores = np.bincount(cells, weights=values, minlength=(end - start) * n_docs).reshape(end - start, n_docs)
+
+    lengths, ids, block_scores = [], [], []
+    for seed in range(start, end):
+        seed_weights = seed_queries.data[seed_queries.indptr[seed]:seed_queries.indptr[seed + 1]]
+        row = scores[seed - start]
+        row /= CosineScorer._query_norm(seed_weights)
+        ranking = CosineScorer.top_k(row, _worker["n_neighbors"])
+        lengths.append(len(ranking))
+        ids.extend(doc_id for _, doc_id in ranking)
+        block_scores.extend(score for score, _ in ranking)
+    return start, lengths, np.array(ids, dtype=np.int32), np.array(block_scores, dtype=np.float64)
+
+class NeighborTableBuilder:
+    """Builds the NeighborTable of an on-disk index on a process pool.
+
+    Every wine is used as a seed the way SimilarWines does for a search by
+    wine_name: its query is the review MySQL returns for the name (the first
+    row whose name matches case- and accent-insensitively), weighted with the
+    index's idf. Seeds are ranked in blocks of block_size, each block with
+    one sparse product (see score_block).
+    """
+    # Cells of the dense block x n_docs score matrix of one block (8 bytes each)
+    BLOCK_CELLS = 4 * 1024 * 1024
+
+    def __init__(self, n_workers=None, block_size=None):
+        if n_workers is None:
+            n_workers = default_worker_count()
+        self.n_workers = n_workers
+        self.block_size = block_size
+
+    @staticmethod
+    def seed_queries(corpus_model, store):
+        """Returns the query vector of every wine as a wine x term CSRMatrix of weights."""
+        # Imported here: SimilarWines needs the database, the workers do not
+        from helpers.search.SimilarWines import SimilarWines
+
+        start_time = time.time()
+        seed_reviews = {}
+        for wine, review in zip(store.text["wine"], store.text["review"]):
+            seed_reviews.setdefault(normalize_key(wine), review)
+
+        indptr = np.zeros(corpus_model.n_docs + 1, dtype=np.int64)
+        term_ids, weights = [], []
+        for wine_id, wine_name in enumerate(corpus_model.wine_table.names):
+            review = seed_reviews.get(normalize_key(wine_name))
+            if review is not None:
+                seed_term_ids, counts = SimilarWines.query_term_counts(review, corpus_model.vocabulary)
+                seed_term_ids, seed_weights = SimilarWines.query_weights(seed_term_ids, counts, corpus_model.idf_array)
+                term_ids.append(seed_term_ids)
+                weights.append(seed_weights)
+                indptr[wine_id + 1] = len(seed_term_ids)
+        np.cumsum(indptr, out=indptr)
+
+        queries = CSRMatrix(indptr,
+                            np.concatenate(term_ids) if term_ids else [],
+                            np.concatenate(weights) if weights else [],
+                            (corpus_model.n_docs, len(corpus_model.vocabulary)), data_dtype=np.float64)
+        end_time = time.time()
+        print("Time taken for building seed queries: {:.4f} seconds".format(end_time - start_time))
+        return queries
+
+    def block_tasks(self, n_docs):
+        block_size = self.block_size or max(1, self.BLOCK_CELLS // max(n_docs, 1))
+        for start in range(0, n_docs, block_size):
+            yield start, min(start + block_size, n_docs)
+
+    def build(self, index_path, store, n_neighbors):
+        """Returns the NeighborTable of the index at index_path.
+
+        store is the WineMetadataStore the seed reviews are read from.
+        """
+        start_time = time.time()
+        corpus_model = IndexStore.load(index_path)
+        seed_queries = self.seed_queries(corpus_model, store)
+
+        if self.n_workers == 1:
+            init_worker(index_path, seed_queries, n_neighbors)
+            table = self.merge(map(score_block, self.block_tasks(corpus_model.n_docs)), n_neighbors, corpus_model)
+        else:
+            with multiprocessing.Pool(self.n_workers, initializer=init_worker, initargs=(index_path, seed_queries, n_neighbors)) as pool:
+                table = self.merge(pool.imap(score_block, self.block_tasks(corpus_model.n_docs)), n_neighbors, corpus_model)
+
+        end_time = time.time()
+        print("Time taken for building neighbor table ({} workers): {:.4f} seconds".format(self.n_workers, end_time - start_time))
+        return table
+
+    @staticmethod
+    def merge(blocks, n_neighbors, corpus_model):
+        lengths, ids, scores = [], [], []
+        for _, block_lengths, block_ids, block_scores in blocks:
+            lengths.extend(block_lengths)
+            ids.append(block_ids)
+            scores.append(block_scores)
+
+        indptr = np.zeros(corpus_model.n_docs + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        return NeighborTable(
+            indptr,
+            np.concatenate(ids) if ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(scores) if scores else np.zeros(0),
+            n_neighbors,
+            corpus_model.version,
+        )
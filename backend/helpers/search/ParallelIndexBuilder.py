@@ -0,0 +1,184 @@
+import os
+import time
+import multiprocessing
+from array import array
+from collections import deque
+import numpy as np
+
+from helpers.search.Tokenizer import Tokenizer
+from helpers.search.Vocabulary import Vocabulary
+from helpers.search.SparseMatrix import CSRMatrix
+
+def default_worker_count():
+    """Processes the offline index builds use: $WINE_INDEX_WORKERS, or one per CPU."""
+    return int(os.environ.get("WINE_INDEX_WORKERS", 0)) or os.cpu_count() or 1
+
+def build_shard_postings(task):
+    """Tokenizes one shard of rows and returns its partial postings.
+
+    task is (index of the shard's first row, reviews). Returns (terms in order
+    of first appearance, indptr, row ids, counts, first positions): the
+    postings of terms[t] are row_ids/counts[indptr[t]:indptr[t + 1]], with
+    global row ids in ascending order, and first_positions holds the index of
+    the first token of terms[t] in each of those rows. Runs in a worker
+    process, so the postings are flat arrays, which are much cheaper to send
+    back than lists of tuples.
+    """
+    first_row, reviews = task
+    # Interning assigns the shard's term ids in order of first appearance
+    tokenizer = Tokenizer()
+    term_ids, offsets = tokenizer.tokenize_batch(reviews)
+    n_terms = len(tokenizer)
+
+    # Count every (term, row) pair at once; sorting by term, then row gives the postings lists
+    rows = np.repeat(np.arange(len(reviews), dtype=np.int64), np.diff(offsets))
+    keys, first_tokens, counts = np.unique(term_ids.astype(np.int64) * len(reviews) + rows, return_index=True, return_counts=True)
+    indptr = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // len(reviews), minlength=n_terms), out=indptr[1:])
+    first_positions = first_tokens - offsets[keys % len(reviews)]
+    return tokenizer.terms, indptr, (keys % len(reviews) + first_row).astype(np.int32), counts.astype(np.int32), first_positions.astype(np.int32)
+
+class ParallelIndexBuilder:
+    """Builds the inverted index on a process pool.
+
+    The index is a Vocabulary plus a term x doc CSRMatrix of term counts: the
+    postings of term id t are row t, ascending doc ids with their counts.
+
+    The rows arrive in batches, which are the shards: each worker tokenizes a
+    shard and returns its partial postings, and the master merges the shards
+    in order. Merging gives exactly the index a serial pass over the docs
+    builds: the same term ids (order of first appearance) and ascending doc
+    ids in every postings list.
+    """
+    # Shards read ahead of the merge per worker, so a slow shard does not leave the others idle
+    PENDING_SHARDS_PER_WORKER = 2
+
+    def __init__(self, n_workers=None):
+        if n_workers is None:
+            n_workers = default_worker_count()
+        self.n_workers = n_workers
+
+    def build_inverted_index_from_batches(self, batches):
+        """Returns (doc names, vocabulary, postings) for the (name, review)
+        rows of batches, e.g. those of MySQLDatabaseHandler.query_batches.
+
+        Every batch is a shard, tokenized while the next ones are read, so the
+        reviews are never all in memory. There is one doc per distinct name, in
+        order of first appearance, indexing the review of the name's last row:
+        the docs of a {name: review} dict filled row by row.
+        """
+        names = {}
+        row_docs = array('i')
+
+        def tasks():
+            n_rows = 0
+            for batch in batches:
+                row_docs.extend([names.setdefault(name, len(names)) for name, _ in batch])
+                yield n_rows, [review for _, review in batch]
+                n_rows += len(batch)
+
+        vocabulary, postings = self.build(tasks(), row_docs)
+        return list(names), vocabulary, postings
+
+    def build(self, tasks, row_docs):
+        """Returns (vocabulary, postings) for the shards tasks yields.
+
+        row_docs holds the doc id of every row; it may still be filled while
+        tasks is consumed.
+        """
+        start_time = time.time()
+
+        if self.n_workers == 1:
+            vocabulary, postings = self.merge(map(build_shard_postings, tasks), row_docs)
+        else:
+            with multiprocessing.Pool(self.n_workers) as pool:
+                # The merge overlaps with the workers
+                vocabulary, postings = self.merge(self.imap_bounded(pool, tasks), row_docs)
+
+        end_time = time.time()
+        print("Time taken for build_inverted_index ({} workers): {:.4f} seconds".format(self.n_workers, end_time - start_time))
+        return vocabulary, postings
+
+    def imap_bounded(self, pool, tasks):
+        """Yields the partial postings of tasks in order, like pool.imap, but
+        only reads the next task once a shard is merged, so streamed rows are
+        never read far ahead of the workers."""
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(build_shard_postings, (task,)))
+            if len(pending) >= self.n_workers * self.PENDING_SHARDS_PER_WORKER:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    @staticmethod
+    def merge(shards, row_docs):
+        # Temporary term ids are assigned in shard order, i.e. by first appearance in the rows
+        term_ids = Tokenizer()
+        shard_terms, shard_rows, shard_counts, shard_positions = [], [], [], []
+        for terms, indptr, rows, counts, first_positions in shards:
+            local_to_global = np.array([term_ids.intern(term) for term in terms], dtype=np.int32)
+            shard_terms.append(np.repeat(local_to_global, np.diff(indptr)))
+            shard_rows.append(rows)
+            shard_counts.append(counts)
+            shard_positions.append(first_positions)
+
+        row_docs = np.asarray(row_docs, dtype=np.int32) if len(row_docs) else np.zeros(0, dtype=np.int32)
+        n_docs = int(row_docs.max()) + 1 if len(row_docs) else 0
+        if not shard_terms:
+            return Vocabulary([]), CSRMatrix(np.zeros(1, dtype=np.int64), [], [], (0, n_docs))
+        terms = np.concatenate(shard_terms)
+        rows = np.concatenate(shard_rows)
+        counts = np.concatenate(shard_counts)
+        vocabulary_terms = term_ids.terms
+
+        if n_docs < len(row_docs):
+            # Only the last row of a doc is indexed
+            _, last_from_end = np.unique(row_docs[::-1], return_index=True)
+            last_rows = len(row_docs) - 1 - last_from_end
+            keep = last_rows[row_docs[rows]] == rows
+            terms, rows, counts = terms[keep], rows[keep], counts[keep]
+            first_positions = np.concatenate(shard_positions)[keep]
+
+            # Renumber the terms by first appearance in doc order, dropping those only superseded rows had
+            first_seen = np.lexsort((first_positions, row_docs[rows]))
+            present, first_index = np.unique(terms[first_seen], return_index=True)
+            present = present[np.argsort(first_index)]
+            new_ids = np.zeros(len(vocabulary_terms), dtype=np.int32)
+            new_ids[present] = np.arange(len(present), dtype=np.int32)
+            terms = new_ids[terms]
+            vocabulary_terms = [vocabulary_terms[term_id] for term_id in present]
+
+        docs = row_docs[rows]
+        n_terms = len(vocabulary_terms)
+        # By term, then ascending doc id
+        order = np.lexsort((docs, terms))
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=n_terms), out=indptr[1:])
+        postings = CSRMatrix(indptr, docs[order], counts[order].astype(np.float32), (n_terms, n_docs))
+        return Vocabulary(vocabulary_terms), postings
+
+    @classmethod
+    def benchmark(cls, review_batches, worker_counts=(1, 2, 4, 8)):
+        """Builds the index with each worker count and prints the scaling.
+
+        review_batches returns a new iterable of (name, review) row batches
+        for every build (see build_inverted_index_from_batches).
+        """
+        timings = []
+        reference = None
+        for n_workers in worker_counts:
+            start_time = time.time()
+            names, vocabulary, postings = cls(n_workers).build_inverted_index_from_batches(review_batches())
+            timings.append((n_workers, time.time() - start_time))
+            index = (names, vocabulary.terms, postings.indptr.tobytes(), postings.indices.tobytes(), postings.data.tobytes())
+            if reference is None:
+                reference = index
+            elif index != reference:
+                raise AssertionError("index built with {} workers differs from the {}-worker index".format(n_workers, worker_counts[0]))
+
+        print("Index build scaling ({} wines, {} CPUs):".format(len(reference[0]), os.cpu_count()))
+        print("{:>8} {:>10} {:>8}".format("workers", "seconds", "speedup"))
+        for n_workers, seconds in timings:
+            print("{:>8} {:>10.4f} {:>7.2f}x".format(n_workers, seconds, timings[0][1] / seconds))
+        return timings
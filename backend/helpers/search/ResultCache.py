@@ -0,0 +1,92 @@
+import time
+import threading
+from collections import OrderedDict
+
+class ResultCache:
+    """Bounded LRU cache of search results with a time-to-live.
+
+    - At most max_entries results are kept; adding one more evicts the least
+      recently used. Entries older than ttl seconds are treated as misses and
+      dropped (ttl=None keeps them until evicted).
+    - Every entry belongs to a corpus version (CorpusModel.version). A lookup
+      with a different version clears the whole cache first, so results of
+      an older index are never served.
+    - Keys come from request_key(), which canonicalizes the request args.
+
+    The cache lives in each process, so every gunicorn worker has its own.
+    """
+
+    def __init__(self, max_entries=1024, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def request_key(args, names):
+        """Returns a hashable key for the request args named in names.
+
+        Args are taken in a fixed order (the order of names), each as the tuple
+        of all its values, so the key does not depend on the order of the query
+        string or on args that do not affect the result. The values themselves
+        keep their order, since that can change the result.
+        """
+        return tuple((name, tuple(args.getlist(name))) for name in names)
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        """Returns the cached result for key, or None on a miss."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key, version, result):
+        """Caches result, which must not be mutated afterwards."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self):
+        """Returns cache counters, for monitoring."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "version": self.version,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
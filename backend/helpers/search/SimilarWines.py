@@ -1,75 +1,186 @@
 # Cosine Similarity Logic from A4
 import time
-import re
 import logging
 import sys
 import os
-import math
 import numpy as np
-from collections import Counter
-from nltk.tokenize import TreebankWordTokenizer as tt
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from db import mysql_engine, MYSQL_DATABASE
+from helpers.search.Tokenizer import Tokenizer, tokenize
+from helpers.search.CorpusModel import CorpusModel
+from helpers.search.ParallelIndexBuilder import ParallelIndexBuilder
+from helpers.search.IndexStore import IndexStore, IndexFormatError, DEFAULT_INDEX_PATH
+from helpers.search.WineMetadataStore import WineMetadataStore
+from helpers.search.ResultCache import ResultCache
+from helpers.search.NeighborTable import NeighborTable, DEFAULT_NEIGHBORS_PATH
+
+# Length of the ranking cached per seed wine; requests for at most this many results are served from it
+SEED_RANKING_SIZE = int(os.environ.get("SEED_CACHE_TOP_N", 1000))
+
+# Review of a seed wine. wine_lower is indexed (see SchemaMigrator); the wine condition keeps the exact match
+SEED_REVIEW_QUERY = f"""SELECT review FROM {MYSQL_DATABASE}.wine_data WHERE wine_lower = LEFT(LOWER(:wine_name), 255) AND wine = :wine_name"""
 
 class SimilarWines:
-    _reviews_cache = None
-    _tokenized_reviews_cache = None
-    _idx_to_wine_name = None
-    _inverted_index_cache = None
+    # Top SEED_RANKING_SIZE ranking per seed wine, for requests without liked/disliked wines,
+    # as (int32 doc ids, float64 scores): 12 bytes per result, filled after the fork so not shared
+    _seed_rankings = ResultCache(max_entries=int(os.environ.get("SEED_CACHE_SIZE", 1024)), ttl=None)
+    # Precomputed rankings of every seed wine (see build_neighbors.py), if available
+    _neighbor_table = None
+
+    _wine_names_cache = None
+    _vocabulary_cache = None
+    _postings_cache = None
     _idf_cache = None
     _doc_norms_cache = None
+    _corpus_model = None
 
-    def __init__(self, wine_name, liked_wines, disliked_wines):
+    def __init__(self, wine_name, liked_wines, disliked_wines, k=None):
         start_time = time.time()
         self.wine_name = wine_name
 
-        if SimilarWines._reviews_cache is None:
-            SimilarWines._reviews_cache = self.get_all_reviews()
-
-        if SimilarWines._tokenized_reviews_cache is None:    
-            SimilarWines._tokenized_reviews_cache, SimilarWines._idx_to_wine_name = self.get_all_reviews_tokenized()
-
-        if SimilarWines._inverted_index_cache is None:
-            SimilarWines._inverted_index_cache = self.build_inverted_index(SimilarWines._tokenized_reviews_cache)
-
-        if SimilarWines._idf_cache is None:
-            SimilarWines._idf_cache = self.compute_idf(SimilarWines._inverted_index_cache, len(SimilarWines._tokenized_reviews_cache))
-
-        if SimilarWines._doc_norms_cache is None:
-            SimilarWines._doc_norms_cache = self.compute_doc_norms(SimilarWines._inverted_index_cache, SimilarWines._idf_cache, len(SimilarWines._tokenized_reviews_cache))
+        # The corpus model is built once per process; query objects only reference it
+        self.corpus = SimilarWines.get_corpus_model()
 
-        self.reviews_non_tokenized = SimilarWines._reviews_cache
-        self.reviews = SimilarWines._tokenized_reviews_cache
-        self.inverted_index = SimilarWines._inverted_index_cache
-        self.idf = SimilarWines._idf_cache
-        self.doc_norms = SimilarWines._doc_norms_cache
+        self.postings = self.corpus.postings
+        self.idf = self.corpus.idf_array
+        self.doc_norms = self.corpus.doc_norms
+        self.wine_table = self.corpus.wine_table
+        self.wine_term_matrix = self.corpus.wine_term_matrix
+        self.vocabulary = self.corpus.vocabulary
 
-        self.wine_name_to_wine_idx = {v: k for k, v in SimilarWines._idx_to_wine_name.items()}
         self.liked_wines = liked_wines
         self.disliked_wines = disliked_wines
-        self.wine_term_matrix = np.zeros([len(self.reviews_non_tokenized), len(self.inverted_index)])
-        self.term_idx_to_term = {}
-        for term_idx, (term, tup_list) in enumerate(self.inverted_index.items()):
-            for (wine_idx, count) in tup_list:
-                self.wine_term_matrix[wine_idx][term_idx] = count
-            self.term_idx_to_term[term_idx] = term
         
-        self.query = self.getQuery(wine_name)
-        self.search_results = self.index_search(self.query, self.inverted_index, self.idf, self.doc_norms)
-        mysql_engine.load_file_into_db("../init.sql")
+        if self.is_cacheable_seed(k):
+            self.search_results = self.seed_ranking(k)
+        else:
+            self.query = self.getQuery(wine_name)
+            self.search_results = self.index_search(self.query, self.postings, self.idf, self.doc_norms, k=k)
         end_time = time.time()
         print("Time taken for INIT: {:.4f} seconds".format(end_time - start_time))
 
+    def is_cacheable_seed(self, k):
+        """True if the results only depend on the seed wine, so its cached ranking can serve them."""
+        return (len(self.liked_wines) == 0 and len(self.disliked_wines) == 0
+                and k is not None and k <= SEED_RANKING_SIZE and self.wine_name in self.wine_table)
+
+    def seed_ranking(self, k):
+        """Returns the top k of the seed wine's ranking.
+
+        It is read from the neighbor table if one is loaded and long enough.
+        Otherwise the top SEED_RANKING_SIZE are scored once and cached; any k
+        up to that is a prefix of the cached ranking, since ranks are ordered
+        by score, then doc id. Price, category, mood, ... filters are applied
+        to the ranking afterwards, so requests that only change those are not
+        rescored.
+        """
+        table = SimilarWines._neighbor_table
+        if table is not None and k <= table.n_neighbors:
+            self.query = None
+            return table.ranking(self.wine_table[self.wine_name], k)
+
+        ranking = SimilarWines._seed_rankings.get(self.wine_name, self.corpus.version)
+        if ranking is None:
+            self.query = self.getQuery(self.wine_name)
+            results = self.index_search(self.query, self.postings, self.idf, self.doc_norms, k=SEED_RANKING_SIZE)
+            ranking = (np.array([doc_id for _, doc_id in results], dtype=np.int32),
+                       np.array([score for score, _ in results], dtype=np.float64))
+            SimilarWines._seed_rankings.put(self.wine_name, self.corpus.version, ranking)
+        else:
+            self.query = None
+        ids, scores = ranking
+        return list(zip(scores[:k].tolist(), ids[:k].tolist()))
+
+    @classmethod
+    def seed_cache_stats(cls):
+        return cls._seed_rankings.stats()
+
+    @classmethod
+    def warm_seed_cache(cls, wine_names):
+        """Scores and caches the ranking of every seed wine in wine_names."""
+        start_time = time.time()
+        corpus = cls.get_corpus_model()
+        wine_names = [wine_name for wine_name in wine_names if wine_name in corpus.wine_table]
+        for wine_name in wine_names:
+            cls(wine_name, liked_wines=[], disliked_wines=[], k=SEED_RANKING_SIZE)
+        end_time = time.time()
+        print("Time taken for warming the seed cache with {} wines: {:.4f} seconds".format(len(wine_names), end_time - start_time))
+
+    @classmethod
+    def initialize_cache(cls, n_workers=None):
+        if cls._postings_cache is None:
+            # A wine keeps the position of its first row and the review of its last row
+            builder = ParallelIndexBuilder(n_workers)
+            cls._wine_names_cache, cls._vocabulary_cache, cls._postings_cache = builder.build_inverted_index_from_batches(cls.review_batches())
+
+    @classmethod
+    def build_corpus_model(cls, n_workers=None):
+        """Builds the corpus model from the reviews in the database, tokenizing
+        them on n_workers processes (see ParallelIndexBuilder)."""
+        cls.initialize_cache(n_workers)
+        n_docs = len(cls._wine_names_cache)
+
+        if cls._idf_cache is None:
+            cls._idf_cache = cls.compute_idf(cls._postings_cache, n_docs)
+
+        if cls._doc_norms_cache is None:
+            cls._doc_norms_cache = cls.compute_doc_norms(cls._postings_cache, cls._idf_cache, n_docs)
+
+        return CorpusModel(cls._wine_names_cache, cls._vocabulary_cache, cls._postings_cache, cls._idf_cache, cls._doc_norms_cache)
+
     @classmethod
-    def initialize_cache(cls):
-        if cls._reviews_cache is None:
-            cls._reviews_cache = cls.get_all_reviews()
+    def initialize_corpus_model(cls, index_path=DEFAULT_INDEX_PATH):
+        """Loads the corpus model from the on-disk index (see build_index.py),
+        falling back to building it from the database if there is none."""
+        if cls._corpus_model is not None:
+            return cls._corpus_model
+
+        if os.path.exists(index_path):
+            try:
+                cls._corpus_model = IndexStore.load(index_path)
+                return cls._corpus_model
+            except IndexFormatError as e:
+                print("Ignoring search index: {}".format(e))
+
+        cls._corpus_model = cls.build_corpus_model()
+        return cls._corpus_model
+
+    @classmethod
+    def initialize_neighbor_table(cls, path=DEFAULT_NEIGHBORS_PATH):
+        """Loads the neighbor table at path, unless it is missing or was built
+        from another version of the corpus."""
+        if not os.path.exists(path):
+            return None
+        try:
+            table = NeighborTable.load(path)
+        except IndexFormatError as e:
+            print("Ignoring neighbor table: {}".format(e))
+            return None
+        if table.version != cls.get_corpus_model().version:
+            print("Ignoring neighbor table {}: built for corpus version {}, not {}".format(path, table.version, cls.get_corpus_model().version))
+            return None
+        cls._neighbor_table = table
+        return table
+
+    @classmethod
+    def release_build_caches(cls):
+        """Drops the class-level references to the arrays the corpus model was
+        built from. The model keeps its own references to the ones it uses.
+        """
+        cls._wine_names_cache = None
+        cls._vocabulary_cache = None
+        cls._postings_cache = None
+        cls._idf_cache = None
+        cls._doc_norms_cache = None
 
-        if cls._tokenized_reviews_cache is None:
-            cls._tokenized_reviews_cache, cls._idx_to_wine_name = cls.get_all_reviews_tokenized()
+    @classmethod
+    def get_corpus_model(cls):
+        if cls._corpus_model is None:
+            return cls.initialize_corpus_model()
+        return cls._corpus_model
 
     def get_similarity_scores(self, limit=None):
         start_time = time.time()
@@ -112,181 +223,113 @@ class SimilarWines:
     def tokenize(text):
         """Returns a list of words that make up the text.
         
-        Note: for simplicity, lowercase everything.
-        Requirement: Use Regex to satisfy this function
+        Note: for simplicity, lowercase everything. Uses the shared Tokenizer,
+        so the terms match the search index.
         
         Params: {text: String}
         Returns: List
         """
-        text = text.lower()
-        result = re.findall(r'\b[^\W\d]+\b', text)
-        
-        return result
+        return tokenize(text)
     
-    @classmethod
-    def get_all_reviews(cls):
-        start_time = time.time()
+    @staticmethod
+    def corpus_checksum():
+        """Returns MySQL's checksum of the wine_data table, which changes with
+        its contents. build_index.py uses it to skip rebuilding an up-to-date index."""
+        query_sql = f"""CHECKSUM TABLE {MYSQL_DATABASE}.wine_data"""
+        row = mysql_engine.query_selector(query_sql).fetchone()
+        return None if row is None or row[1] is None else str(row[1])
+
+    @staticmethod
+    def review_batches():
+        """Returns the (wine, review) rows of wine_data, streamed in batches (see query_batches)."""
         query_sql = f"""SELECT wine, review FROM {MYSQL_DATABASE}.wine_data"""
-        data = mysql_engine.query_selector(query_sql)
-        reviews = {d[0]: d[1] for d in data}
-        end_time = time.time()
-        print("Time taken for get_all_reviews: {:.4f} seconds".format(end_time - start_time))
-        return reviews
+        return mysql_engine.query_batches(query_sql)
     
     def get_wines_metadata(self, wine_ids):
         start_time = time.time()
-        wine_names = [self.get_wine_name_from_id(msg_id) for msg_id in wine_ids]
-        wine_names_str = "', '".join([wine_name.replace("'", "''").replace("%", "%%") for wine_name in wine_names])
-        query_sql = f"""SELECT wine, price, category, varietal, appellation, country, review FROM {MYSQL_DATABASE}.wine_data WHERE wine IN ('{wine_names_str}')"""
-        cursor = mysql_engine.query_selector(query_sql)
-        wine_metadata_dict = {}
-
-        for wine_name, price, category, varietal, appellation, country, review in cursor:
-            wine_metadata_dict[wine_name] = {
-                "wine_name": wine_name,
-                "price": price,
-                "category": category,
-                "varietal": varietal,
-                "appellation": appellation,
-                "country": country,
-                "review": review
-            }
+        store = WineMetadataStore.get()
+        wine_metadata_list = []
 
-        # Sort the wine metadata list based on the order of the input wine names
-        wine_metadata_list = [wine_metadata_dict[wine_name] for wine_name in wine_names]
+        for msg_id in wine_ids:
+            # Like the former WHERE wine IN (...) query, the last row of a wine wins
+            row = store.last_row_of(msg_id)
+            wine_metadata = {"wine_name": self.wine_table.name_of(msg_id)}
+            for column in ["price", "category", "varietal", "appellation", "country", "review"]:
+                wine_metadata[column] = store.value(column, row) if row >= 0 else None
+            wine_metadata_list.append(wine_metadata)
 
         end_time = time.time()
         print("Time taken for get_wines_metadata: {:.4f} seconds".format(end_time - start_time))
         return wine_metadata_list
         
-    @classmethod
-    def get_all_reviews_tokenized(cls):
-        start_time = time.time()
-
-        # reviews = list(cls._reviews_cache.values())
-        # idx_to_wine_name = dict(enumerate(cls._reviews_cache.keys()))
-        reviews = []
-        idx_to_wine_name = {}
-        for idx, (wine_name, review) in enumerate(cls._reviews_cache.items()):
-            reviews.append(review)
-            idx_to_wine_name[idx] = wine_name
-        tokenized_reviews = [cls.tokenize(review) for review in reviews]
-        end_time = time.time()
-        print("Time taken for reviews_tokenized: {:.4f} seconds".format(end_time - start_time))
-        return tokenized_reviews, idx_to_wine_name
-
-    
     def get_wine_name_from_id(self, msg_id):
-        return list(self.reviews_non_tokenized.keys())[msg_id]
+        return self.wine_table.name_of(msg_id)
     
-    def build_inverted_index(self, tokenized_reviews):
-        start_time = time.time()
+    @staticmethod
+    def compute_idf(postings, n_docs, min_df=200, max_df_ratio=0.2):
+        """Returns the idf of every term id as a float32 array (NaN for ignored terms)."""
+        df = np.diff(postings.indptr)
+        idf = np.log2(n_docs / (1 + df))
 
-        inverted_index = {}
-        for i, review in enumerate(tokenized_reviews):
-            # Use Counter to count term occurrences in the review
-            term_counts = Counter(review)
-            for term, count in term_counts.items():
-                inverted_index.setdefault(term, []).append((i, count))
+        # Ignore ignore all terms that occur in strictly fewer than min_df documents
+        # Ignore all words that occur in more than max_df_ratio of the documents.
+        idf[(df < min_df) | (df / n_docs > max_df_ratio)] = np.nan
 
-        # No need to sort inverted_index[term] as it's already sorted
+        return idf.astype(np.float32)
+
+    @staticmethod
+    def compute_doc_norms(postings, idf, n_docs):
+        """Returns the tf-idf norm of every wine as a float32 array."""
+        row_ids = postings.row_ids()
+        keep = ~np.isnan(idf)[row_ids]
+        weights = postings.data[keep].astype(np.float64) * idf[row_ids[keep]]
+        norms = np.bincount(postings.indices[keep], weights=weights ** 2, minlength=n_docs)
 
-        end_time = time.time()
-        print("Time taken for build_inverted_index: {:.4f} seconds".format(end_time - start_time))
-        return inverted_index
-    
-    def compute_idf(self, inv_idx, n_docs, min_df=200, max_df_ratio=0.2):
-        idf = {}
-    
-        for term in inv_idx:
-            df = len(inv_idx[term])
-            
-            # Ignore ignore all terms that occur in strictly fewer than min_df documents
-            # Ignore all words that occur in more than max_df_ratio of the documents.
-            if df < min_df or df / n_docs > max_df_ratio:
-                continue
-                
-            idf[term] = math.log2(n_docs / (1 + df))
-            
-        return idf
-    
-    def compute_doc_norms(self, index, idf, n_docs):
-        inv_index = {key: val for key, val in index.items()
-           if key in idf}
-        norms = np.zeros(n_docs)
-    
-        for term in inv_index.keys():
-            if term not in idf:
-                continue
-            for doc_id, tf in inv_index[term]:
-                norms[doc_id] += (tf * idf[term]) ** 2
-                
         norms = np.sqrt(norms)
-        
-        return norms
-    
-    def accumulate_dot_scores(self, query_word_counts, index, idf):
-        doc_scores = {}
-    
-        for term in query_word_counts.keys():
-            if term in index:
-                for doc_id, tf in index[term]:
-                    if term in idf:
-                        q_i = query_word_counts[term] * idf[term]
-                        d_ij = tf * idf[term]
-                    else:
-                        q_i = 0
-                        d_ij = 0
-
-                    if doc_id not in doc_scores:
-                        doc_scores[doc_id] = 0
-
-                    doc_scores[doc_id] += q_i * d_ij
-                    
-        return doc_scores
+
+        return norms.astype(np.float32)
     
-    def index_search(self, query, index, idf, doc_norms, score_func=accumulate_dot_scores, tokenizer=tt()):
+    @staticmethod
+    def query_term_counts(query, vocabulary, tokenizer=Tokenizer()):
+        """Returns the term ids of query (in order of first appearance) and their counts."""
+        # Tokenize query like the reviews were, so its terms match the index
+        query_term_counts = {}
+        for word in tokenizer.tokenize(query):
+            term_idx = vocabulary.id_of(word)
+            if term_idx is not None:
+                query_term_counts[term_idx] = query_term_counts.get(term_idx, 0) + 1
+        term_ids = np.fromiter(query_term_counts.keys(), dtype=np.int64, count=len(query_term_counts))
+        counts = np.fromiter(query_term_counts.values(), dtype=np.float64, count=len(query_term_counts))
+        return term_ids, counts
+
+    @staticmethod
+    def query_weights(term_ids, counts, idf):
+        """Returns the idf-weighted query vector over the terms that carry weight."""
+        term_idf = idf[term_ids].astype(np.float64)
+        keep = (counts != 0) & ~np.isnan(term_idf)
+        return term_ids[keep], counts[keep] * term_idf[keep]
+
+    def index_search(self, query, index, idf, doc_norms, tokenizer=Tokenizer(), k=None):
+        """Returns the k most similar wines as [(score, doc_id), ...], best first.
+
+        k=None ranks every wine with a positive score.
+        """
         start_time = time.time()
         # if query is None:
         #     return []
         
         # If either the liked wines list or the disliked wines list is non-empty, use rocchio
         if len(self.liked_wines) > 0 or len(self.disliked_wines) > 0:
-            rocchio = self.get_rocchio_vector(self.wine_name, self.liked_wines, self.disliked_wines, self.wine_term_matrix, self.wine_name_to_wine_idx)
-            rocchio = rocchio.tolist()
-            query_word_counts = {}
-            for term_idx, word_count in enumerate(rocchio):
-                query_word_counts[self.term_idx_to_term[term_idx]] = word_count
+            term_ids, counts = self.get_rocchio_vector(self.wine_name, self.liked_wines, self.disliked_wines, self.wine_term_matrix, self.wine_table)
         elif query is not None:
-            # Tokenize query
-            query_words = tokenizer.tokenize(query.lower())
-            query_word_counts = {}
-            for word in query_words:
-                query_word_counts[word] = query_word_counts.get(word, 0) + 1
+            term_ids, counts = self.query_term_counts(query, self.vocabulary, tokenizer)
         else:
             return []
 
-        # Compute dot products
-        doc_scores = score_func(self, query_word_counts, index, idf)
-        
-        # Get normalized query
-        norm_sum = 0
-        for word in query_word_counts:
-            if word in idf:
-                norm_sum += (query_word_counts[word] * idf[word])**2
-        
-        query_norm = np.sqrt(norm_sum)
-        if query_norm == 0:
-            query_norm = 1
-        
-        # Normalize scores
-        for doc_id in doc_scores:
-            doc_scores[doc_id] /= (query_norm * doc_norms[doc_id])
-            # doc_scores[doc_id] = np.log(doc_scores[doc_id]) - np.log(query_norm) - np.log(doc_norms[doc_id])
-        
-        # Return sorted results
-        results = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
-        results = [(score, doc_id) for doc_id, score in results]
+        term_ids, weights = self.query_weights(term_ids, counts, idf)
+
+        # Cosine scores against the precomputed unit-length document vectors
+        results = self.corpus.scorer.rank(term_ids, weights, k=k)
 
         end_time = time.time()
         print("Time taken for index_search: {:.4f} seconds".format(end_time - start_time))
@@ -297,9 +340,7 @@ class SimilarWines:
         # Construct query to get review for given wine name
         start_time = time.time()
 
-        wine_name = wine_name.replace("'", "''")
-        query_sql = f"""SELECT review FROM {MYSQL_DATABASE}.wine_data WHERE wine = '{wine_name}'"""        
-        cursor = mysql_engine.query_selector(query_sql)
+        cursor = mysql_engine.query_selector(SEED_REVIEW_QUERY, {"wine_name": wine_name})
 
         # Iterate over cursor to get review text
         end_time = time.time()
@@ -315,31 +356,39 @@ class SimilarWines:
         
     def get_rocchio_vector(self, query, relevant, irrelevant, input_doc_matrix, \
             wine_name_to_index, a=1, b=1, c=9999999999999999, clip = True):
-        
+        """Returns the Rocchio query vector as sparse (term ids, weights).
+
+        Only the rows of the seed, liked and disliked wines are read, and the
+        vector only spans the terms they contain; term ids are ascending and
+        zero weights are dropped.
+        """
         start_time = time.time()
 
-        if query == "null" or query is None:
-            query_vec = np.zeros_like(input_doc_matrix[0,:])
-        else:
-            query_vec = input_doc_matrix[wine_name_to_index[query], :]
-        relevant_update_vec, irrelevant_update_vec = np.zeros_like(query_vec), np.zeros_like(query_vec) 
+        query_rows = [wine_name_to_index[query]] if query != "null" and query is not None else []
+        query_terms, query_counts = input_doc_matrix.sum_rows(query_rows)
+        relevant_terms, relevant_counts = input_doc_matrix.sum_rows([wine_name_to_index[rel_name] for rel_name in relevant])
+        irrelevant_terms, irrelevant_counts = input_doc_matrix.sum_rows([wine_name_to_index[irrel_name] for irrel_name in irrelevant])
+
+        # Dense over the union of the touched terms only
+        term_ids = np.union1d(np.union1d(query_terms, relevant_terms), irrelevant_terms)
+        query_vec, relevant_update_vec, irrelevant_update_vec = np.zeros((3, len(term_ids)))
+        query_vec[np.searchsorted(term_ids, query_terms)] = query_counts
+        relevant_update_vec[np.searchsorted(term_ids, relevant_terms)] = relevant_counts
+        irrelevant_update_vec[np.searchsorted(term_ids, irrelevant_terms)] = irrelevant_counts
         num_relevant, num_irrelevant = len(relevant), len(irrelevant)
-        
+
         if num_relevant > 0:
-            for rel_name in relevant:
-                relevant_update_vec += input_doc_matrix[wine_name_to_index[rel_name], :]
             relevant_update_vec = (b / float(num_relevant)) * relevant_update_vec
 
         if num_irrelevant > 0:
-            for irrel_name in irrelevant:
-                irrelevant_update_vec += input_doc_matrix[wine_name_to_index[irrel_name], :]
             irrelevant_update_vec = (c / float(num_irrelevant)) * irrelevant_update_vec
-        
+
         rocchio = a * query_vec + relevant_update_vec - irrelevant_update_vec
         if clip:
             np.clip(rocchio, 0, None, out=rocchio)
+        non_zero = rocchio != 0
 
         end_time = time.time()
         print("Time taken for ROCCHIO: {:.4f} seconds".format(end_time - start_time))
 
-        return rocchio
\ No newline at end of file
+        return term_ids[non_zero].astype(np.int64), rocchio[non_zero]
\ No newline at end of file
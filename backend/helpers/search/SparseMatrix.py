@@ -0,0 +1,74 @@
+import numpy as np
+
+class CSRMatrix:
+    """Compressed sparse row matrix backed by flat indptr/indices/data arrays.
+
+    Row i holds the column indices indices[indptr[i]:indptr[i + 1]] and their
+    values in the same slice of data. The arrays may be compact array.array
+    buffers, NumPy arrays or memory-mapped file regions; they are exposed as
+    zero-copy read-only NumPy views.
+    """
+
+    def __init__(self, indptr, indices, data, shape, data_dtype=np.float32):
+        self.shape = shape
+        self.indptr = self._as_readonly(indptr, np.int64)
+        self.indices = self._as_readonly(indices, np.int32)
+        self.data = self._as_readonly(data, data_dtype)
+
+    @staticmethod
+    def _as_readonly(buffer, dtype):
+        if isinstance(buffer, np.ndarray):
+            view = buffer.astype(dtype, copy=False)
+        elif len(buffer) == 0:
+            view = np.zeros(0, dtype=dtype)
+        else:
+            view = np.frombuffer(buffer, dtype=dtype)
+        view.flags.writeable = False
+        return view
+
+    def row_ids(self):
+        """Returns the row index of every stored entry."""
+        return np.repeat(np.arange(self.shape[0], dtype=np.int32), np.diff(self.indptr))
+
+    def transpose(self):
+        """Returns the transposed matrix, with every row's columns in ascending order."""
+        # A stable sort by column keeps the original rows ascending within each new row
+        order = np.argsort(self.indices, kind="stable")
+        indptr = np.zeros(self.shape[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=self.shape[1]), out=indptr[1:])
+        return CSRMatrix(indptr, self.row_ids()[order], self.data[order], (self.shape[1], self.shape[0]), data_dtype=self.data.dtype)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def sum_rows(self, rows):
+        """Returns the sum of the given rows as a sparse vector: (ascending
+        column indices, float64 values), holding only the columns that occur."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        columns = np.concatenate([self.indices[self.indptr[i]:self.indptr[i + 1]] for i in rows])
+        values = np.concatenate([self.data[self.indptr[i]:self.indptr[i + 1]] for i in rows]).astype(np.float64)
+        columns, positions = np.unique(columns, return_inverse=True)
+        return columns, np.bincount(positions, weights=values, minlength=len(columns))
+
+    def weighted_row_sum(self, rows, weights):
+        """Returns sum(weights[k] * row rows[k]) as a dense float64 vector.
+
+        This is the transposed product M^T q for a sparse q, and only touches
+        the rows named in rows.
+        """
+        out = np.zeros(self.shape[1])
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        if len(starts) == 0 or not np.any(ends > starts):
+            return out
+        columns = np.concatenate([self.indices[s:e] for s, e in zip(starts, ends)])
+        values = np.concatenate([self.data[s:e] * w for s, e, w in zip(starts, ends, weights)])
+        out += np.bincount(columns, weights=values, minlength=self.shape[1])
+        return out
@@ -0,0 +1,65 @@
+import re
+from array import array
+import numpy as np
+
+# A word is a run of letters: digits and punctuation split words and are dropped
+WORD_PATTERN = re.compile(r'\b[^\W\d]+\b')
+
+class Tokenizer:
+    """The tokenizer shared by the corpus build, the query path and the
+    flavor/varietal counters, so documents and queries always agree on terms.
+
+    tokenize() is a plain lowercase + regex split. A Tokenizer instance can
+    also intern terms to dense integer ids (in order of first appearance) and
+    tokenize whole batches of texts into one flat id array.
+    """
+
+    def __init__(self):
+        self.term_to_id = {}
+        self.terms = []
+
+    @staticmethod
+    def tokenize(text):
+        """Returns the list of (lowercase) words that make up text."""
+        return WORD_PATTERN.findall(text.lower())
+
+    def __len__(self):
+        return len(self.terms)
+
+    def intern(self, term):
+        """Returns the id of term, assigning the next id if it is new."""
+        term_id = self.term_to_id.get(term)
+        if term_id is None:
+            term_id = self.term_to_id[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def term_id(self, term, default=None):
+        """Returns the id of term, or default if it was never interned."""
+        return self.term_to_id.get(term, default)
+
+    def tokenize_ids(self, text, add=True):
+        """Returns the term ids of text as an array('i').
+
+        With add=False unknown terms are skipped instead of interned.
+        """
+        if add:
+            intern = self.intern
+            return array('i', [intern(term) for term in self.tokenize(text)])
+        term_to_id = self.term_to_id
+        return array('i', [term_to_id[term] for term in self.tokenize(text) if term in term_to_id])
+
+    def tokenize_batch(self, texts, add=True):
+        """Tokenizes a list of texts into (ids, offsets): the term ids of all
+        texts in one flat int32 array, those of texts[i] being
+        ids[offsets[i]:offsets[i + 1]].
+        """
+        ids = array('i')
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        for i, text in enumerate(texts):
+            ids.extend(self.tokenize_ids(text, add))
+            offsets[i + 1] = len(ids)
+        return np.frombuffer(ids, dtype=np.int32) if len(ids) else np.zeros(0, dtype=np.int32), offsets
+
+# Module-level shortcut for callers that only need the words
+tokenize = Tokenizer.tokenize
@@ -0,0 +1,25 @@
+class Vocabulary:
+    """Two-way term <-> term id table of the search index.
+
+    Term ids are dense (0 .. len - 1) and index every per-term array: the
+    rows of the postings matrix, idf, the scorer's weight rows. Like
+    WineNameTable, id -> term is a tuple lookup and term -> id a dict lookup.
+    """
+    __slots__ = ("terms", "_ids")
+
+    def __init__(self, terms):
+        self.terms = tuple(terms)
+        self._ids = {term: idx for idx, term in enumerate(self.terms)}
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self._ids
+
+    def __getitem__(self, term):
+        """Returns the id of term; raises KeyError for unknown terms."""
+        return self._ids[term]
+
+    def id_of(self, term, default=None):
+        return self._ids.get(term, default)
@@ -0,0 +1,103 @@
+import time
+import unicodedata
+import numpy as np
+
+def normalize_key(value):
+    """Case- and accent-insensitive form of a string, as MySQL's default
+    utf8mb4_0900_ai_ci collation compares them."""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+class WineFilterIndex:
+    """Precomputed structured-filter index over a WineMetadataStore.
+
+    - category / country / varietal / appellation prefix (the part before the
+      first comma): one packed bitset (np.packbits, 1 bit per row) per distinct
+      value, keyed by normalize_key
+    - price_numeric: rows sorted by price, so a price range is two binary searches
+    A search's filters are resolved by AND-ing bitsets, which takes microseconds.
+    """
+    BITSET_COLUMNS = ["category", "country", "varietal"]
+
+    def __init__(self, store):
+        start_time = time.time()
+        self.store = store
+        self.n_rows = store.n_rows
+        self.all_rows = np.packbits(np.ones(self.n_rows, dtype=bool))
+
+        self.bitsets = {}
+        for column in self.BITSET_COLUMNS:
+            keys = [normalize_key(category) for category in store.categories[column]]
+            self.bitsets[column] = self.build_bitsets(store.codes[column], keys)
+        appellation_keys = [normalize_key(category.split(",", 1)[0]) for category in store.categories["appellation"]]
+        self.bitsets["appellation"] = self.build_bitsets(store.codes["appellation"], appellation_keys)
+
+        price = store.numeric["price_numeric"]
+        # NaN (NULL) prices sort last and are never inside a range
+        self.price_order = np.argsort(price, kind="stable").astype(np.int32)
+        self.sorted_prices = price[self.price_order][:int(np.count_nonzero(~np.isnan(price)))]
+
+        self._wine_name_rows = None
+
+        end_time = time.time()
+        print("Time taken for building WineFilterIndex: {:.4f} seconds".format(end_time - start_time))
+
+    def build_bitsets(self, codes, code_keys):
+        """Returns {key: packed bitset of the rows whose code maps to key}."""
+        key_to_codes = {}
+        for code, key in enumerate(code_keys):
+            key_to_codes.setdefault(key, []).append(code)
+
+        bitsets = {}
+        for key, key_codes in key_to_codes.items():
+            bitsets[key] = np.packbits(np.isin(codes, key_codes))
+        return bitsets
+
+    def rows_to_bitset(self, rows):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def bitset_to_rows(self, bitset):
+        return np.flatnonzero(np.unpackbits(bitset, count=self.n_rows))
+
+    def price_bitset(self, min_price=None, max_price=None):
+        lo = 0 if min_price is None else np.searchsorted(self.sorted_prices, float(min_price), side="left")
+        hi = len(self.sorted_prices) if max_price is None else np.searchsorted(self.sorted_prices, float(max_price), side="right")
+        return self.rows_to_bitset(self.price_order[lo:max(lo, hi)])
+
+    def wine_names_bitset(self, wine_names):
+        """Rows whose wine is one of wine_names (case-insensitive) or blank."""
+        if self._wine_name_rows is None:
+            # Only the rarely used `wine` filter needs this, so build it on first use
+            wine_name_rows = {}
+            for row, wine_name in enumerate(self.store.text["wine"]):
+                key = "" if len(wine_name.strip()) == 0 else normalize_key(wine_name)
+                wine_name_rows.setdefault(key, []).append(row)
+            self._wine_name_rows = wine_name_rows
+
+        rows = list(self._wine_name_rows.get("", []))
+        for key in set(normalize_key(wine_name) for wine_name in wine_names):
+            rows.extend(self._wine_name_rows.get(key, []))
+        return self.rows_to_bitset(np.array(rows, dtype=np.int64))
+
+    def candidate_bitset(self, min_price=None, max_price=None, category=None, varietal=None, country=None, appellation=None, wine_names=None):
+        """Returns the packed bitset of the rows that satisfy every given filter."""
+        bitset = self.all_rows
+        if min_price is not None or max_price is not None:
+            bitset = bitset & self.price_bitset(min_price, max_price)
+
+        for column, value in (("category", category), ("varietal", varietal), ("country", country), ("appellation", appellation)):
+            if value:
+                value_bitset = self.bitsets[column].get(normalize_key(value))
+                if value_bitset is None:
+                    return np.zeros_like(self.all_rows)
+                bitset = bitset & value_bitset
+
+        if wine_names:
+            bitset = bitset & self.wine_names_bitset(wine_names)
+        return bitset
+
+    def candidate_rows(self, **filters):
+        """Returns the ids (ascending, i.e. table order) of the rows that satisfy every filter."""
+        return self.bitset_to_rows(self.candidate_bitset(**filters))
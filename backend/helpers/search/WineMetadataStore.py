@@ -0,0 +1,151 @@
+import sys
+import os
+import time
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db import mysql_engine, MYSQL_DATABASE
+from helpers.search.WineFilterIndex import WineFilterIndex
+from helpers.search.WineNameAutocomplete import WineNameAutocomplete
+from helpers.search.FacetCatalog import FacetCatalog
+from helpers.search.FlavorIndex import FlavorIndex
+
+class WineMetadataStore:
+    """Columnar, in-memory copy of the wine_data table.
+
+    Loaded once at startup so that ranked results can be hydrated (and
+    filtered) without another MySQL round-trip. Rows keep the table's order.
+      - numeric columns: float64 arrays, NaN for NULL
+      - categorical columns: int32 codes into a tuple of distinct values, -1 for NULL
+      - other columns: tuples of the raw values
+    Rows are linked to the corpus by wine id (see WineNameTable); a wine
+    appearing in several rows maps to all of them. Structured search filters
+    are resolved against the precomputed WineFilterIndex in `filters`, and
+    wine name suggestions against the WineNameAutocomplete in `autocomplete`,
+    varietal and region suggestions against the FacetCatalog in `facets`,
+    and flavor keywords against the reviews' FlavorIndex in `flavors`.
+    """
+    COLUMNS = ["wine", "country", "winery", "category", "designation", "varietal", "appellation", "price", "rating", "reviewer", "review", "price_numeric", "price_range", "alcohol_numeric"]
+    NUMERIC_COLUMNS = ["price_numeric", "rating", "alcohol_numeric"]
+    CATEGORICAL_COLUMNS = ["country", "category", "varietal", "appellation"]
+
+    _instance = None
+
+    def __init__(self, rows, wine_table):
+        start_time = time.time()
+
+        columns = dict(zip(self.COLUMNS, zip(*rows))) if rows else {name: () for name in self.COLUMNS}
+        self.n_rows = len(rows)
+
+        self.numeric = {}
+        self.integer_columns = set()
+        for name in self.NUMERIC_COLUMNS:
+            values = columns[name]
+            self.numeric[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            if all(v is None or isinstance(v, int) for v in values):
+                self.integer_columns.add(name)
+
+        self.codes = {}
+        self.categories = {}
+        for name in self.CATEGORICAL_COLUMNS:
+            self.codes[name], self.categories[name] = self.encode_categorical(columns[name])
+
+        self.text = {name: tuple(columns[name]) for name in self.COLUMNS
+                     if name not in self.numeric and name not in self.codes}
+
+        # wine id of every row (-1 if the wine is not in the corpus), and the
+        # inverse: rows of wine id w are wine_rows[wine_row_indptr[w]:wine_row_indptr[w + 1]]
+        self.row_wine_ids = np.array([wine_table.id_of(name, -1) for name in self.text["wine"]], dtype=np.int32)
+        in_corpus = np.flatnonzero(self.row_wine_ids >= 0)
+        order = np.argsort(self.row_wine_ids[in_corpus], kind="stable")
+        self.wine_rows = in_corpus[order].astype(np.int32)
+        self.wine_row_indptr = np.zeros(len(wine_table) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.row_wine_ids[in_corpus], minlength=len(wine_table)), out=self.wine_row_indptr[1:])
+
+        self.filters = WineFilterIndex(self)
+        self.autocomplete = WineNameAutocomplete(self.text["wine"])
+        self.facets = FacetCatalog(self)
+        self.flavors = FlavorIndex(self.text["review"])
+
+        end_time = time.time()
+        print("Time taken for building WineMetadataStore: {:.4f} seconds".format(end_time - start_time))
+
+    @staticmethod
+    def encode_categorical(values):
+        """Returns (int32 codes, tuple of distinct values in first-seen order)."""
+        value_to_code = {}
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+            else:
+                codes[i] = value_to_code.setdefault(value, len(value_to_code))
+        return codes, tuple(value_to_code)
+
+    @classmethod
+    def load_rows(cls):
+        start_time = time.time()
+        query_sql = f"""SELECT {", ".join(cls.COLUMNS)} FROM {MYSQL_DATABASE}.wine_data"""
+        rows = [tuple(row) for row in mysql_engine.query_stream(query_sql)]
+        end_time = time.time()
+        print("Time taken for loading wine_data: {:.4f} seconds".format(end_time - start_time))
+        return rows
+
+    @classmethod
+    def initialize(cls, wine_table):
+        if cls._instance is None:
+            cls._instance = cls(cls.load_rows(), wine_table)
+        return cls._instance
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            # Imported here: SimilarWines itself uses the store
+            from helpers.search.SimilarWines import SimilarWines
+            return cls.initialize(SimilarWines.get_corpus_model().wine_table)
+        return cls._instance
+
+    def rows_of(self, wine_id):
+        """Returns the row ids of wine_id, in table order."""
+        return self.wine_rows[self.wine_row_indptr[wine_id]:self.wine_row_indptr[wine_id + 1]]
+
+    def rows_of_wines(self, wine_ids):
+        """Returns the row ids of all wine_ids, in table order."""
+        if len(wine_ids) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.sort(np.concatenate([self.rows_of(wine_id) for wine_id in wine_ids]))
+
+    def last_row_of(self, wine_id):
+        """Returns the last row of wine_id in table order (-1 if it has none)."""
+        end = self.wine_row_indptr[wine_id + 1]
+        return int(self.wine_rows[end - 1]) if end > self.wine_row_indptr[wine_id] else -1
+
+    def value(self, column, row):
+        """Returns the value of column at row as MySQL would have returned it."""
+        if column in self.numeric:
+            value = self.numeric[column][row]
+            if np.isnan(value):
+                return None
+            return int(value) if column in self.integer_columns else float(value)
+        if column in self.codes:
+            code = self.codes[column][row]
+            return None if code < 0 else self.categories[column][code]
+        return self.text[column][row]
+
+    def row_dict(self, row, columns=None):
+        """Returns {column: value} for row, like a SELECT of columns (all by default)."""
+        return {column: self.value(column, row) for column in (columns or self.COLUMNS)}
+
+    def filter_rows(self, rows, **filters):
+        """Returns the subset of rows (kept in order) that satisfy the search filters.
+
+        Same semantics as the WHERE clause sql_search_reviews used to build:
+        price bounds exclude NULL prices, text filters are case-insensitive and
+        appellation matches the part before the first comma. See
+        WineFilterIndex.candidate_bitset for the accepted filters.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        keep = np.unpackbits(self.filters.candidate_bitset(**filters), count=self.n_rows).astype(bool)
+        return rows[keep[rows]]
@@ -0,0 +1,90 @@
+import time
+import numpy as np
+
+from helpers.search.WineFilterIndex import normalize_key
+from helpers.search.prefixRange import prefix_range
+
+class WineNameAutocomplete:
+    """In-memory autocomplete index over the wine names of the table.
+
+    Answers what the former /suggest_wines query did:
+
+        SELECT wine FROM wine_data WHERE wine_lower LIKE '%input%'
+        ORDER BY (wine_lower LIKE 'input%') DESC, wine ASC LIMIT 30
+
+    deduplicated in rank order, without a database call:
+      - the distinct names are sorted by their case- and accent-insensitive
+        key (normalize_key, like the column's collation), so the prefix
+        matches are one contiguous range found by binary search
+      - infix matches come from a trigram index: the positions (in sorted
+        order) of the names containing each trigram. The postings of the
+        query's rarest trigram are walked in order and checked with a
+        substring test, so matches come out alphabetically and the walk stops
+        as soon as enough rows were found
+    Queries shorter than a trigram scan the sorted names, which stops early too.
+    """
+    # Rows the former query returned (LIMIT), and distinct names returned out of them
+    ROW_LIMIT = 30
+    SUGGESTION_LIMIT = 6
+    # wine_lower keeps the first 255 characters
+    KEY_LENGTH = 255
+
+    def __init__(self, wine_names):
+        start_time = time.time()
+
+        # Rows per distinct name: the LIMIT counts rows, duplicates included
+        row_counts = {}
+        for name in wine_names:
+            if name is not None:
+                row_counts[name] = row_counts.get(name, 0) + 1
+
+        entries = sorted((normalize_key(name[:self.KEY_LENGTH]), name) for name in row_counts)
+        self.keys = [key for key, _ in entries]
+        self.names = [name for _, name in entries]
+        self.row_counts = [row_counts[name] for name in self.names]
+
+        trigram_positions = {}
+        for position, key in enumerate(self.keys):
+            for trigram in {key[i:i + 3] for i in range(len(key) - 2)}:
+                trigram_positions.setdefault(trigram, []).append(position)
+        self.trigrams = {trigram: np.array(positions, dtype=np.int32) for trigram, positions in trigram_positions.items()}
+
+        end_time = time.time()
+        print("Time taken for building WineNameAutocomplete: {:.4f} seconds".format(end_time - start_time))
+
+    def infix_positions(self, key):
+        """Yields the positions of the names containing key, in alphabetical order."""
+        if len(key) < 3:
+            candidates = range(len(self.keys))
+        else:
+            postings = [self.trigrams.get(key[i:i + 3]) for i in range(len(key) - 2)]
+            if any(p is None for p in postings):
+                return
+            candidates = min(postings, key=len).tolist()
+        keys = self.keys
+        for position in candidates:
+            if key in keys[position]:
+                yield position
+
+    def suggest(self, input, limit=SUGGESTION_LIMIT):
+        """Returns up to limit distinct wine names matching input, prefix matches
+        first, then alphabetically."""
+        key = normalize_key(input or "")
+        suggestions = []
+        rows = 0
+
+        start, end = prefix_range(self.keys, key)
+        for position in range(start, end):
+            if rows >= self.ROW_LIMIT or len(suggestions) >= limit:
+                return suggestions
+            suggestions.append(self.names[position])
+            rows += self.row_counts[position]
+
+        for position in self.infix_positions(key):
+            if rows >= self.ROW_LIMIT or len(suggestions) >= limit:
+                break
+            if start <= position < end:
+                continue
+            suggestions.append(self.names[position])
+            rows += self.row_counts[position]
+        return suggestions
@@ -0,0 +1,28 @@
+class WineNameTable:
+    """Two-way wine id <-> wine name table shared by every search path.
+
+    Ids are the corpus document ids (row order of the index). id -> name is a
+    tuple lookup and name -> id a dict lookup: both are constant time and
+    return existing objects, so no lookup allocates.
+    """
+    __slots__ = ("names", "_ids")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self._ids = {name: idx for idx, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __getitem__(self, name):
+        """Returns the id of name; raises KeyError for unknown wines."""
+        return self._ids[name]
+
+    def name_of(self, idx):
+        return self.names[idx]
+
+    def id_of(self, name, default=None):
+        return self._ids.get(name, default)
@@ -1,7 +1,44 @@
 from collections import defaultdict
 import re
+import numpy as np
 
-def boolean_search(data, keywords, similarity_scores=None, flavorSearch=None):
+def count_matches(data, keywords, flavor_index=None):
+    """Returns the (exact, substring) match counts of keywords in the review
+    of every item of data, as lists.
+
+    Items with a 'row' of flavor_index are counted from its postings (and
+    positions, for phrases); other items, and keywords it cannot match
+    (patterns, words not separated by single spaces), fall back to scanning
+    the review with the keyword's patterns.
+    """
+    num_exact_matches = np.zeros(len(data), dtype=np.int64)
+    num_substring_matches = np.zeros(len(data), dtype=np.int64)
+
+    rows = np.array([d.get('row', -1) for d in data], dtype=np.int64) if flavor_index is not None else np.full(len(data), -1, dtype=np.int64)
+    indexed = np.flatnonzero(rows >= 0)
+    scanned = np.flatnonzero(rows < 0)
+
+    for keyword in keywords:
+        if flavor_index is not None and flavor_index.can_match(keyword):
+            exact, substring = flavor_index.match_counts(keyword)
+            num_exact_matches[indexed] += exact[rows[indexed]]
+            num_substring_matches[indexed] += substring[rows[indexed]]
+            items = scanned
+        else:
+            items = range(len(data))
+        if len(items) == 0:
+            continue
+
+        exact_pattern = re.compile(r'\b{}\b'.format(keyword), re.IGNORECASE)
+        substring_pattern = re.compile(r'\b{}[\w]*\b'.format(keyword), re.IGNORECASE)
+        for i in items:
+            review = data[i]['review']
+            num_exact_matches[i] += len(exact_pattern.findall(review))
+            num_substring_matches[i] += len(substring_pattern.findall(review))
+
+    return num_exact_matches.tolist(), num_substring_matches.tolist()
+
+def boolean_search(data, keywords, similarity_scores=None, flavorSearch=None, flavor_index=None):
     results = []
 
     if similarity_scores:
@@ -9,15 +46,10 @@ def boolean_search(data, keywords, similarity_scores=None, flavorSearch=None):
     else:
         similarity_scores_dict = {}
     
-    for d in data:
-        review = d['review']
-
-        # Count exact matches
-        num_exact_matches = sum(len(re.findall(r'\b{}\b'.format(keyword), review, re.IGNORECASE)) for keyword in keywords)
-
-        # Count substring matches
-        num_substring_matches = sum(len(re.findall(r'\b{}[\w]*\b'.format(keyword), review, re.IGNORECASE)) for keyword in keywords)
+    # Count exact and substring matches, from the flavor index where possible
+    exact_counts, substring_counts = count_matches(data, keywords, flavor_index)
 
+    for d, num_exact_matches, num_substring_matches in zip(data, exact_counts, substring_counts):
         # Subtract exact matches from substring matches to avoid double counting
         num_substring_matches -= num_exact_matches
 
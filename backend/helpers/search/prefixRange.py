@@ -0,0 +1,9 @@
+from bisect import bisect_left
+
+def prefix_range(sorted_keys, prefix, start=0):
+    """Returns (start, end) of the keys of the sorted list sorted_keys that
+    start with prefix: they are one contiguous range."""
+    start = bisect_left(sorted_keys, prefix, start)
+    # Every key starting with prefix sorts before prefix + the largest code point
+    end = bisect_left(sorted_keys, prefix + "\U0010ffff", start)
+    return start, end
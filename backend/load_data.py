@@ -0,0 +1,32 @@
+"""Loads init.sql into the local database, or exports wine_data to a CSV that
+later loads can bulk load instead of running init.sql's INSERTs.
+
+Run from the backend folder:
+
+    python load_data.py [--csv wine_data.csv] [--force]
+    python load_data.py --export-csv wine_data.csv
+
+app.py runs the same load at startup (with $WINE_DATA_CSV as the CSV). Loads
+are skipped while init.sql (and the CSV) are unchanged; --force reloads anyway.
+"""
+import os
+import argparse
+
+from db import mysql_engine
+from helpers.database.SqlFileLoader import SqlFileLoader
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sql", default=os.path.join(os.environ['ROOT_PATH'], 'init.sql'))
+    parser.add_argument("--csv", default=os.environ.get('WINE_DATA_CSV'))
+    parser.add_argument("--export-csv")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    loader = SqlFileLoader(mysql_engine)
+    if args.export_csv:
+        loader.export_csv("wine_data", args.export_csv)
+    else:
+        if args.force:
+            mysql_engine.query_executor(f"DROP TABLE IF EXISTS {SqlFileLoader.CHECKSUM_TABLE}")
+        loader.load(args.sql, args.csv)
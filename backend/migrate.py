@@ -0,0 +1,28 @@
+"""Applies the wine_data schema migration (see helpers/database/SchemaMigrator.py)
+and checks with EXPLAIN that the seed review lookup still uses its index.
+
+Run from the backend folder:
+
+    python migrate.py
+
+Exits with status 1 if it can no longer use the index.
+"""
+import sys
+
+from db import mysql_engine, MYSQL_DATABASE
+from helpers.database.SchemaMigrator import SchemaMigrator
+from helpers.search.SimilarWines import SEED_REVIEW_QUERY
+
+def index_checks():
+    """(name, (query, params), index it must be able to use, or None if it has to scan)"""
+    return [
+        ("seed review lookup", (SEED_REVIEW_QUERY, {"wine_name": "La Crema Pinot Noir"}), "idx_wine_lower"),
+    ]
+
+if __name__ == "__main__":
+    migrator = SchemaMigrator(mysql_engine, MYSQL_DATABASE)
+    migrator.migrate()
+    regressions = migrator.check_index_usage(index_checks())
+    if regressions:
+        print("Index usage regressed for: {}".format(", ".join(regressions)))
+        sys.exit(1)
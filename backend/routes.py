@@ -1,6 +1,10 @@
+import os
 import json
 import time
+from collections import Counter
 from helpers.search.SimilarWines import SimilarWines
+from helpers.search.WineMetadataStore import WineMetadataStore
+from helpers.search.ResultCache import ResultCache
 from helpers.misc.FlavorTypoCorrector import FlavorTypoCorrector
 from helpers.search.booleanSearch import boolean_search
 from data_fetchers import (
@@ -10,27 +14,71 @@ from data_fetchers import (
     fetch_region_suggestions,
 )
 
+# Every request arg that changes the /wine_reviews result
+SEARCH_PARAMS = (
+    "wine_name", "flavors", "likedWines", "dislikedWines",
+    "minPrice", "maxPrice", "category", "country", "varietal", "appellation", "mood", "wine",
+)
+
+# Per-process cache of /wine_reviews responses, see ResultCache
+result_cache = ResultCache(
+    max_entries=int(os.environ.get("RESULT_CACHE_SIZE", 1024)),
+    ttl=int(os.environ.get("RESULT_CACHE_TTL", 600)),
+)
+
+# Corrects typos in the requested flavors; shared, so its memo is too
+flavor_typo_corrector = FlavorTypoCorrector(3)
+
+# Requests per seed wine in this process, served on /seed_stats to pick the wines to warm the seed cache with.
+# Only wines of the corpus are counted, and at most SEED_STATS_SIZE of them are kept
+seed_request_counts = Counter()
+SEED_STATS_SIZE = int(os.environ.get("SEED_STATS_SIZE", 10000))
+
+def count_seed_request(wine_name):
+    if wine_name not in SimilarWines.get_corpus_model().wine_table:
+        return
+    seed_request_counts[wine_name] += 1
+    # Trimmed to the most requested wines once it holds twice the limit, so trimming stays rare
+    if len(seed_request_counts) > 2 * SEED_STATS_SIZE:
+        most_requested = seed_request_counts.most_common(SEED_STATS_SIZE)
+        seed_request_counts.clear()
+        seed_request_counts.update(dict(most_requested))
+
 def wine_reviews_search(request):
+    count_seed_request(request.args.get("wine_name"))
+
+    key = ResultCache.request_key(request.args, SEARCH_PARAMS)
+    version = SimilarWines.get_corpus_model().version
+    results = result_cache.get(key, version)
+    if results is None:
+        results = compute_wine_reviews_search(request)
+        result_cache.put(key, version, results)
+    return results
+
+def compute_wine_reviews_search(request):
     # Get user input 
     wine_name = request.args.get("wine_name")
     flavors = request.args.getlist("flavors")
     liked_wines = request.args.getlist("likedWines")
     disliked_wines = request.args.getlist("dislikedWines")
 
-    flavor_typo_corrector = FlavorTypoCorrector(3)
     flavors = flavor_typo_corrector.get_replaced_flavor_list(flavors)
 
     similarity_scores = None
 
     # Check if wine_name, liked wines, or disliked wines are provided
     if wine_name != "null" or len(liked_wines) > 0 or len(disliked_wines) > 0:
-        sw = SimilarWines(wine_name, liked_wines=liked_wines, disliked_wines=disliked_wines)
+        # Only the top 1000 are used, so don't rank the whole corpus
+        sw = SimilarWines(wine_name, liked_wines=liked_wines, disliked_wines=disliked_wines, k=1000)
         similarity_scores = sw.get_similarity_scores(limit=1000)
 
         # If flavors are also provided, filter the similarity_scores by flavors
         if len(flavors) > 0 and flavors[0] != '':
-            wine_data = [item for item in similarity_scores]
-            filtered_wine_data = boolean_search(wine_data, flavors, similarity_scores)
+            # Each wine's review is that of its last row, which the flavor index is looked up by
+            store = WineMetadataStore.get()
+            wine_table = SimilarWines.get_corpus_model().wine_table
+            wine_data = [dict(item, row=store.last_row_of(wine_table[item['wine_name']])) for item in similarity_scores]
+            filtered_wine_data = boolean_search(wine_data, flavors, similarity_scores, flavor_index=store.flavors)
             similarity_scores = [{'wine_name': item['wine_name'], 'combined_score': item['combined_score'], 'score': item['score'], 'term_score': item['term_score']} for item in filtered_wine_data] 
     
     results = sql_search_reviews(request, similarity_scores)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app imports its modules as helpers.*, relative to the backend folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,46 @@
+import numpy as np
+
+from helpers.search.CosineScorer import CosineScorer
+from helpers.search.SparseMatrix import CSRMatrix
+
+def build_scorer(seed=0, n_terms=40, n_docs=300):
+    """Small random corpus in which the wines come in pairs with the same review, so scores tie."""
+    rng = np.random.RandomState(seed)
+    tf = rng.poisson(0.3, size=(n_terms, n_docs))
+    tf[:, n_docs // 2:] = tf[:, :n_docs - n_docs // 2]
+    idf = np.log(n_docs / np.maximum(np.count_nonzero(tf, axis=1), 1))
+    idf[rng.rand(n_terms) < 0.1] = np.nan
+    doc_norms = np.sqrt(np.nansum((tf * idf[:, None]) ** 2, axis=0))
+    doc_norms[doc_norms == 0] = 1
+
+    rows, columns = np.nonzero(tf)
+    indptr = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_terms), out=indptr[1:])
+    postings = CSRMatrix(indptr, columns, tf[rows, columns], (n_terms, n_docs), data_dtype=np.int32)
+    return CosineScorer.from_postings(postings, idf, doc_norms), idf
+
+def exhaustive_ranking(scores):
+    """Every positive score, by descending score, then ascending doc id."""
+    ranked = sorted((-score, doc_id) for doc_id, score in enumerate(scores.tolist()) if score > 0)
+    return [(-score, doc_id) for score, doc_id in ranked]
+
+def test_rank_is_prefix_of_exhaustive_ranking():
+    scorer, idf = build_scorer()
+    rng = np.random.RandomState(1)
+    for _ in range(30):
+        term_ids = rng.choice(len(idf), size=rng.randint(1, 8), replace=False)
+        term_ids = term_ids[~np.isnan(idf[term_ids])]
+        weights = rng.randint(1, 4, size=len(term_ids)) * idf[term_ids]
+        expected = exhaustive_ranking(scorer.score(term_ids, weights))
+        assert scorer.rank(term_ids, weights) == expected
+        for k in (1, 5, 10, 50, 1000):
+            assert scorer.rank(term_ids, weights, k=k) == expected[:k]
+
+def test_score_is_cosine_similarity():
+    scorer, idf = build_scorer()
+    term_ids = np.flatnonzero(~np.isnan(idf))[:5]
+    weights = idf[term_ids]
+    dense = np.zeros(scorer.weight_matrix.shape)
+    dense[scorer.weight_matrix.row_ids(), scorer.weight_matrix.indices] = scorer.weight_matrix.data
+    expected = weights @ dense[term_ids] / np.linalg.norm(weights)
+    assert np.allclose(scorer.score(term_ids, weights), expected)
@@ -0,0 +1,58 @@
+import re
+
+import numpy as np
+import pytest
+
+from helpers.search.FlavorIndex import FlavorIndex
+from helpers.search.booleanSearch import count_matches
+
+REVIEWS = [
+    "Aromas of black cherry, dark chocolate and cedar. Dark chocolate-covered cherries linger on the finish.",
+    "A bright, zesty white with lemon zest, green apple and wet stone; crisp  and mineral.",
+    "Black Cherry and BLACK CHERRIES dominate, with hints of vanilla, toast and dark  chocolate.",
+    "Ripe plum, blackberry jam and licorice. Drink 2018-2025; 14.5% alcohol.",
+    "la la la la la: a Rosé from Provence with strawberry, crème fraîche and café-au-lait notes.",
+    "Earthy, with forest floor, mushroom and leather; tannins are firm, the oak_aged finish long.",
+    "",
+    " Leading space, then citrus peel,\ngrapefruit and a trailing newline\n",
+    "Cherry cherry cherry-cherry cherry_pie cherrywood chérie",
+    "Smooth  dark chocolate and black-cherry, dark\nchocolate again, then dark chocolates.",
+]
+
+KEYWORDS = [
+    "cherry", "cherr", "CHERRY", "black cherry", "black cherr", "dark chocolate", "dark choc",
+    "la la", "la la la", "rosé", "crè", "2018", "20", "oak_aged", "oak", "citrus peel", "chocolate",
+    "zest", "a", "", "wine", "green apple and",
+]
+
+def regex_counts(review, keyword):
+    """The counts of boolean_search's patterns, before the flavor index."""
+    exact = len(re.findall(r'\b{}\b'.format(keyword), review, re.IGNORECASE))
+    substring = len(re.findall(r'\b{}[\w]*\b'.format(keyword), review, re.IGNORECASE))
+    return exact, substring
+
+@pytest.fixture(scope="module")
+def flavor_index():
+    return FlavorIndex(REVIEWS)
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_match_counts_equal_regex_counts(flavor_index, keyword):
+    exact, substring = flavor_index.match_counts(keyword)
+    for row, review in enumerate(REVIEWS):
+        assert (exact[row], substring[row]) == regex_counts(review, keyword), review
+
+def test_count_matches_mixes_indexed_and_scanned_items(flavor_index):
+    keywords = ["dark chocolate", "cherr", "dark  chocolate", "cherr.*"]
+    data = [{'review': review, 'row': row} for row, review in enumerate(REVIEWS)]
+    # Items without a row of the index are scanned
+    data.append({'review': "A cherry-red wine with dark chocolate."})
+    exact, substring = count_matches(data, keywords, flavor_index)
+    for i, item in enumerate(data):
+        counts = [regex_counts(item['review'], keyword) for keyword in keywords]
+        assert (exact[i], substring[i]) == (sum(e for e, _ in counts), sum(s for _, s in counts))
+
+def test_varint_round_trip():
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 31 - 1, 5]
+    encoded, sizes = FlavorIndex.encode_varint(np.array(values, dtype=np.int64))
+    assert FlavorIndex.decode_varint(encoded).tolist() == values
+    assert sizes.tolist() == [1, 1, 1, 2, 2, 2, 3, 5, 1]